@@ -0,0 +1,259 @@
+"""
+Work-precision benchmarks of the IVP methods on the bundled systems
+"""
+
+import csv
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+import Initial_Value_Problems as ivp
+import Stiff_Solvers as stiff
+import Extrapolation_Solvers as extrap
+
+#Problems from the example scripts: (f, u_0, t_final, step counts for the fixed step methods)
+#Step counts are powers of two so that t_final / n is exact and the last point lands on t_final
+#----------------------------------
+def _lorenz(t, u):
+    return np.array([10 * (u[1] - u[0]), u[0] * (28 - u[2]) - u[1], u[0] * u[1] - 8/3 * u[2]])
+
+PROBLEMS = {
+    "logistic": (lambda t,u: u * (1 - u),
+                 0.5, 10, [2**k for k in range(4, 11)]),
+
+    "pendulum": (lambda t,u: np.array([ u[1] , -10 * np.sin(u[0]) ]),
+                 np.array([3 * np.pi / 4, 0]), 10, [2**k for k in range(7, 13)]),
+
+    "van_der_pol": (lambda t,u: np.array([ u[1] , 20 * (1 - u[0] ** 2) * u[1] - u[0] ]),
+                    np.array([1.05, 0.]), 20, [2**k for k in range(9, 14)]),
+
+    "lorenz": (_lorenz, np.array([1., 1., 1.]), 5, [2**k for k in range(9, 14)]),
+
+    "projectile": (lambda t,u: np.array([- 1/ 8 * np.sqrt(u[0] ** 2 + u[1] ** 2) * u[0],
+                                         - 4 - 1/ 8 * np.sqrt(u[0] ** 2 + u[1] ** 2) * u[1], u[0], u[1] ]),
+                   np.array([5., 12., 0., 0.]), 2, [2**k for k in range(3, 10)]),
+}
+
+ERR_TARGETS = [10.**-k for k in range(3, 11)]
+REFERENCE_ERR_TARGET = 1e-13
+#----------------------------------
+
+
+class CountingRHS:
+    """
+    Wraps a right-hand side and counts how many times it is evaluated
+
+    Parameters
+    f: function of t and u where f = du/dt
+    """
+    def __init__(self, f):
+        self.f = f
+        self.n_evals = 0
+
+    def __call__(self, t, u):
+        self.n_evals += 1
+        return self.f(t, u)
+
+
+def reference_solution(f, u_0, t_final):
+    """
+    Computes the solution at t_final to near machine precision, with
+    Gragg-Bulirsch-Stoer extrapolation (far cheaper than dopri5 at this tolerance)
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+
+    Returns
+    u_final: solution at t_final
+    """
+    t_list, u_list = extrap.integrate_extrapolation(f, u_0, t_final, REFERENCE_ERR_TARGET)
+    return u_list[-1]
+
+
+def _run(problem, method, setting, solve, f, u_ref, repeats):
+    """
+    Times solve(f_counted) and measures its error at t_final
+
+    Returns
+    record: dict with the problem, method, setting, wall time (best of repeats),
+            RHS evaluations, number of points and error
+    """
+    best = np.inf
+    for i in range(repeats):
+        f_counted = CountingRHS(f)
+        start = time.perf_counter()
+        with np.errstate(all = "ignore"): #large steps may blow up, which shows as an infinite error
+            t_list, u_list = solve(f_counted)[:2]
+        best = min(best, time.perf_counter() - start)
+
+    error = float(np.linalg.norm(np.atleast_1d(u_list[-1] - u_ref)))
+    if not np.isfinite(error):
+        error = np.inf
+
+    return {"problem": problem, "method": method, "setting": setting, "time": best,
+            "n_evals": f_counted.n_evals, "n_points": len(t_list), "error": error}
+
+
+def run_benchmarks(problems = None, methods = None, embedded_methods = None, err_targets = ERR_TARGETS,
+                   include_bdf = True, include_extrapolation = True, repeats = 1):
+    """
+    Runs every fixed step method at each step count and every adaptive method
+    at each error target on each problem
+
+    Parameters
+    problems: list of names in PROBLEMS, defaults to all of them
+    methods: fixed step methods, defaults to every name in ivp.TABLEAUS and ivp.MULTISTEP_METHODS
+    embedded_methods: adaptive methods, defaults to every name in ivp.EMBEDDED_TABLEAUS
+    err_targets: error targets for the adaptive methods
+    include_bdf: also run Stiff_Solvers.integrate_bdf at each error target
+    include_extrapolation: also run Extrapolation_Solvers.integrate_extrapolation at each error target
+    repeats: runs per setting, the fastest wall time is kept
+
+    Returns
+    records: list of dicts with keys problem, method, setting (dt or err_target),
+             time, n_evals, n_points and error (2-norm at t_final)
+    """
+    if problems is None:
+        problems = list(PROBLEMS)
+    if methods is None:
+        methods = list(ivp.TABLEAUS) + list(ivp.MULTISTEP_METHODS)
+    if embedded_methods is None:
+        embedded_methods = list(ivp.EMBEDDED_TABLEAUS)
+
+    records = []
+    for problem in problems:
+        f, u_0, t_final, step_counts = PROBLEMS[problem]
+        u_ref = reference_solution(f, u_0, t_final)
+
+        for method in methods:
+            for n in step_counts:
+                dt = t_final / n
+                solve = lambda f_counted: ivp.integrate_ivp(f_counted, u_0, dt, t_final, method)
+                records.append( _run(problem, method, dt, solve, f, u_ref, repeats) )
+
+        for method in embedded_methods:
+            for err_target in err_targets:
+                solve = lambda f_counted: ivp.integrate_adaptive(f_counted, u_0, t_final, err_target, method)
+                records.append( _run(problem, "adaptive " + method, err_target, solve, f, u_ref, repeats) )
+
+        if include_bdf:
+            for err_target in err_targets:
+                solve = lambda f_counted: stiff.integrate_bdf(f_counted, u_0, t_final, err_target)
+                records.append( _run(problem, "bdf", err_target, solve, f, u_ref, repeats) )
+
+        if include_extrapolation:
+            for err_target in err_targets:
+                solve = lambda f_counted: extrap.integrate_extrapolation(f_counted, u_0, t_final, err_target)
+                records.append( _run(problem, "extrapolation", err_target, solve, f, u_ref, repeats) )
+
+    return records
+
+
+def print_table(records):
+    """
+    Prints a work-precision table for each problem
+
+    Parameters
+    records: list of dicts from run_benchmarks
+    """
+    for problem in dict.fromkeys(record["problem"] for record in records):
+        print("\n" + problem)
+        print("{:<26}{:>12}{:>12}{:>10}{:>12}".format("method", "dt / tol", "time (s)", "RHS", "error"))
+        for record in records:
+            if record["problem"] == problem:
+                print("{:<26}{:>12.3g}{:>12.4f}{:>10d}{:>12.3g}".format(record["method"], record["setting"],
+                      record["time"], record["n_evals"], record["error"]))
+
+
+def plot_work_precision(records):
+    """
+    Plots error against RHS evaluations and against wall time for each problem,
+    one line per method
+
+    Parameters
+    records: list of dicts from run_benchmarks
+
+    Results
+    One figure per problem with the two work-precision diagrams
+    """
+    for problem in dict.fromkeys(record["problem"] for record in records):
+        fig = plt.figure( figsize = (12, 5) )
+        ax = fig.subplots(1, 2)
+        fig.suptitle(problem)
+
+        for method in dict.fromkeys(record["method"] for record in records if record["problem"] == problem):
+            runs = [record for record in records if record["problem"] == problem and record["method"] == method
+                    and 0 < record["error"] < np.inf]
+            ax[0].loglog([run["n_evals"] for run in runs], [run["error"] for run in runs], "o-", label = method)
+            ax[1].loglog([run["time"] for run in runs], [run["error"] for run in runs], "o-", label = method)
+
+        ax[0].set_xlabel("RHS evaluations")
+        ax[1].set_xlabel("wall time (s)")
+        for cur_ax in ax:
+            cur_ax.set_ylabel("error at $t_{final}$")
+        ax[1].legend(fontsize = "small")
+
+
+def save_records(records, path):
+    """
+    Writes benchmark records to a csv file
+    """
+    with open(path, "w", newline = "") as file:
+        writer = csv.DictWriter(file, fieldnames = list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def load_records(path):
+    """
+    Reads benchmark records written by save_records
+    """
+    with open(path, newline = "") as file:
+        records = list(csv.DictReader(file))
+    for record in records:
+        for key in ["setting", "time", "error"]:
+            record[key] = float(record[key])
+        for key in ["n_evals", "n_points"]:
+            record[key] = int(record[key])
+    return records
+
+
+def find_regressions(baseline, records, time_factor = 1.5, error_factor = 10):
+    """
+    Compares records against a saved baseline run of the same settings
+
+    Parameters
+    baseline: list of dicts from load_records
+    records: list of dicts from run_benchmarks
+    time_factor: allowed slow-down in wall time
+    error_factor: allowed growth in error
+
+    Returns
+    regressions: list of (record, baseline record, reason) for every run that got
+                 slower, needs more RHS evaluations or is less accurate
+    """
+    previous = {(record["problem"], record["method"], "{:.6g}".format(record["setting"])): record
+                for record in baseline}
+    regressions = []
+    for record in records:
+        old = previous.get( (record["problem"], record["method"], "{:.6g}".format(record["setting"])) )
+        if old is None:
+            continue
+        if record["time"] > time_factor * old["time"]:
+            regressions.append( (record, old, "time") )
+        if record["n_evals"] > old["n_evals"]:
+            regressions.append( (record, old, "RHS evaluations") )
+        if record["error"] > error_factor * old["error"]:
+            regressions.append( (record, old, "error") )
+    return regressions
+
+
+def main():
+    records = run_benchmarks()
+    print_table(records)
+    plot_work_precision(records)
+
+
+if __name__ == "__main__":
+    main()
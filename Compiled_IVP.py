@@ -0,0 +1,252 @@
+"""
+Computational Math Module 5: Compiled (Numba) backend for Initial Value Problems
+"""
+
+import warnings
+import numpy as np
+import Initial_Value_Problems as ivp
+
+try:
+    import numba
+except ImportError: #optional dependency, the solvers fall back to the Python path
+    numba = None
+
+_compiled_rhs = {} #compiled right-hand sides, keyed by the original function
+
+
+def _rk_loop(f, u_0, t_list, dt, a, b, c, u_list):
+    """
+    Fixed step explicit Runge-Kutta loop over 1-d states, written for Numba
+    Steps in the type of u_0 (with a, b, c and dt given in that type) and
+    stores into u_list in its own type
+    """
+    s = len(b)
+    d = len(u_0)
+    k = np.empty( (s, d), u_0.dtype )
+    u = u_0.copy()
+    u_stage = np.empty(d, u_0.dtype)
+    u_list[0] = u
+
+    for i in range(len(t_list) - 1):
+        for st in range(s):
+            for m in range(d):
+                total = u[m]
+                for j in range(st):
+                    total += dt * a[st, j] * k[j, m]
+                u_stage[m] = total
+            k[st] = f(t_list[i] + c[st] * dt, u_stage)
+
+        for m in range(d):
+            total = 0.
+            for j in range(s):
+                total += b[j] * k[j, m]
+            u[m] += dt * total
+        u_list[i + 1] = u
+
+
+def _adaptive_loop(f, u_0, t_final, err_target, dt_0, a, b, b_hat, c, order, fsal):
+    """
+    Embedded Runge-Kutta loop with step rejection over 1-d states, written for Numba
+    Mirrors ivp._adaptive_steps and grows its output geometrically
+    Steps and stores in the type of u_0, as _rk_loop
+    """
+    s = len(b)
+    d = len(u_0)
+    k = np.empty( (s, d), u_0.dtype )
+    u = u_0.copy()
+    u_stage = np.empty(d, u_0.dtype)
+    u_new = np.empty(d, u_0.dtype)
+    exponent = 1 / (order + 1)
+
+    t_buf = np.empty(1024)
+    u_buf = np.empty( (1024, d), u_0.dtype )
+    t_buf[0] = 0.
+    u_buf[0] = u
+    n = 1
+
+    t = 0.
+    dt = dt_0
+    k[0] = f(t, u)
+
+    while t < t_final:
+        if dt < 10 * abs(np.nextafter(t, np.inf) - t):
+            raise Exception("Step size fell below the minimum")
+        dt = min(dt, t_final - t) #land exactly on t_final
+
+        for st in range(1, s):
+            for m in range(d):
+                total = u[m]
+                for j in range(st):
+                    total += dt * a[st, j] * k[j, m]
+                u_stage[m] = total
+            k[st] = f(t + c[st] * dt, u_stage)
+
+        err_sq = 0.
+        for m in range(d):
+            total = 0.
+            err = 0.
+            for j in range(s):
+                total += b[j] * k[j, m]
+                err += (b[j] - b_hat[j]) * k[j, m]
+            u_new[m] = u[m] + dt * total
+            err_sq += (dt * err) ** 2
+        err_current = np.sqrt(err_sq)
+
+        if not np.isfinite(err_current):
+            factor = 0.2
+        elif err_current == 0:
+            factor = 5.
+        else:
+            factor = min(5., max(0.2, 0.9 * (err_target / err_current) ** exponent))
+
+        if not err_current <= err_target: #also rejects a NaN error
+            dt *= factor #reject the step and retry from the same point
+            continue
+
+        t += dt
+        u[:] = u_new
+        if fsal:
+            k[0] = k[s - 1]
+        else:
+            k[0] = f(t, u)
+
+        if n == len(t_buf):
+            t_grown = np.empty(2 * n)
+            u_grown = np.empty( (2 * n, d), u_0.dtype )
+            t_grown[:n] = t_buf
+            u_grown[:n] = u_buf
+            t_buf = t_grown
+            u_buf = u_grown
+        t_buf[n] = t
+        u_buf[n] = u
+        n += 1
+
+        dt *= factor
+
+    return t_buf[:n].copy(), u_buf[:n].copy()
+
+
+if numba is not None:
+    _rk_loop = numba.njit(_rk_loop)
+    _adaptive_loop = numba.njit(_adaptive_loop)
+
+
+def compile_rhs(f, scalar = False):
+    """
+    Compiles a right-hand side with Numba, caching the result per function
+    Right-hand sides such as lambda t,u: np.array([...]) compile as they are;
+    variables they capture are frozen at their current values.
+
+    Parameters
+    f: function of t and u where f = du/dt (or an already compiled function)
+    scalar: True if f is for a scalar equation, the compiled function then
+            takes and returns 1-element arrays
+
+    Returns
+    f_compiled: compiled function of t and a 1-d array u
+    """
+    key = (f, scalar)
+    if key not in _compiled_rhs:
+        f_jit = f if isinstance(f, numba.core.registry.CPUDispatcher) else numba.njit(f)
+        if scalar:
+            f_vec = numba.njit(lambda t, u: np.array([f_jit(t, u[0])]))
+        else:
+            f_vec = f_jit
+        _compiled_rhs[key] = f_vec
+    return _compiled_rhs[key]
+
+
+def _fallback(error):
+    """
+    Reports that the compiled path could not be used
+    """
+    warnings.warn("Compiled backend unavailable, using the Python solver (" + str(error) + ")")
+
+
+def integrate_ivp(f, u_0, dt, t_final, method, dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final,
+    compiling f and the whole stepping loop to native code with Numba
+    Falls back to ivp.integrate_ivp if Numba is missing or f does not compile,
+    and for the multistep methods, which have no compiled loop
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    dt: time step
+    t_final: final time
+    method: name of a method in ivp.TABLEAUS or a Butcher tableau (a, b, c)
+    dtype: type the solution is stored in, see ivp.integrate_ivp
+    step_dtype: type the steps are computed in, see ivp.integrate_ivp
+
+    Returns
+    t_list: array of time points
+    u_list: array of ordered tuples representing solution at each time, of type dtype
+    """
+    if numba is None or (isinstance(method, str) and method in ivp.MULTISTEP_METHODS):
+        return ivp.integrate_ivp(f, u_0, dt, t_final, method, dtype = dtype, step_dtype = step_dtype)
+
+    dtype, step_dtype = ivp._precision(dtype, step_dtype)
+    a, b, c = (coef.astype(step_dtype) for coef in ivp.get_tableau(method))
+    n = int(t_final / dt)
+    t_list = np.linspace(0, t_final, n + 1)
+    u = np.atleast_1d( ivp._initial_state(u_0, step_dtype) )
+    u_list = np.empty( (n + 1, len(u)), dtype = dtype )
+
+    try:
+        _rk_loop(compile_rhs(f, isinstance(u_0, float)), u, t_list.astype(step_dtype), step_dtype.type(dt),
+                 a, b, c, u_list)
+    except Exception as error: #typing and lowering errors surface on the first call
+        _fallback(error)
+        return ivp.integrate_ivp(f, u_0, dt, t_final, method, dtype = dtype, step_dtype = step_dtype)
+
+    if isinstance(u_0, float):
+        u_list = u_list[:, 0]
+    return t_list, u_list
+
+
+def integrate_adaptive(f, u_0, t_final, err_target, method = "dopri5", dt_0 = 0.01,
+                       dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final,
+    compiling f and the whole stepping loop to native code with Numba
+    Falls back to ivp.integrate_adaptive if Numba is missing or f does not compile
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    method: name of a method in ivp.EMBEDDED_TABLEAUS or an embedded tableau
+    dt_0: first trial time step
+    dtype: type the solution is stored in, see ivp.integrate_adaptive
+    step_dtype: type the steps are computed in, see ivp.integrate_adaptive
+
+    Returns
+    t_list: array of time points used, shape (n,)
+    u_list: array of solution at each time, shape (n,) or (n, d), of type dtype
+    """
+    if numba is None:
+        return ivp.integrate_adaptive(f, u_0, t_final, err_target, method, dt_0, dtype = dtype, step_dtype = step_dtype)
+
+    dtype, step_dtype = ivp._precision(dtype, step_dtype)
+    a, b, b_hat, c, order = ivp.get_embedded_tableau(method)
+    fsal = c[-1] == 1 and np.array_equal(a[-1, :-1], b[:-1]) and b[-1] == 0
+    a, b, b_hat, c = (coef.astype(step_dtype) for coef in (a, b, b_hat, c))
+    u = np.atleast_1d( ivp._initial_state(u_0, step_dtype) )
+    if err_target < 10 * np.finfo(step_dtype).eps * max(1, np.max(np.abs(u))):
+        raise Exception("err_target is below what " + step_dtype.name + " steps can resolve")
+
+    try:
+        t_list, u_list = _adaptive_loop(compile_rhs(f, isinstance(u_0, float)), u, float(t_final),
+                                        float(err_target), float(dt_0), a, b, b_hat, c, order, fsal)
+    except Exception as error:
+        if str(error).startswith("Step size fell below"): #a failure of the problem, not of the compilation
+            raise
+        _fallback(error)
+        return ivp.integrate_adaptive(f, u_0, t_final, err_target, method, dt_0, dtype = dtype, step_dtype = step_dtype)
+    u_list = u_list.astype(dtype, copy = False)
+
+    if isinstance(u_0, float):
+        u_list = u_list[:, 0]
+    return t_list, u_list
@@ -0,0 +1,204 @@
+"""
+Computational Math Module 5: Gragg-Bulirsch-Stoer extrapolation for high accuracy Initial Value Problems
+"""
+
+import numpy as np
+import Initial_Value_Problems as ivp
+
+#Constants of the extrapolation method
+#----------------------------------
+MAX_ROWS = 9 #largest extrapolation table, the highest order is 2 * MAX_ROWS
+STEP_COUNTS = 2 * np.arange(1, MAX_ROWS + 1) #midpoint substeps for each row (2, 4, 6, ...)
+COSTS = 1 + np.cumsum(STEP_COUNTS - 1) #RHS calls to build rows 1..j, f(t, u) is shared by every row
+MIN_FACTOR = 0.02 #smallest allowed step size change
+MAX_FACTOR = 4 #largest allowed step size change
+#----------------------------------
+
+
+def modified_midpoint(f, t, u, f_u, H, n):
+    """
+    Gragg's modified midpoint rule: n substeps of size h = H / n, the first an
+    Euler step and the rest leapfrog steps z_m+1 = z_m-1 + 2 h f(t_m, z_m)
+    For even n the error has an expansion in even powers of h, which is what
+    makes Richardson extrapolation in h^2 work
+
+    Parameters
+    f: function of t and u where f = du/dt
+    t: time at the start of the step
+    u: solution at t
+    f_u: f(t, u), shared by every call for the same (t, u)
+    H: total step size
+    n: number of substeps (even)
+
+    Returns
+    z: approximate solution at t + H
+    """
+    h = H / n
+    z_prev = u
+    z = u + h * f_u
+    for m in range(1, n):
+        z_prev, z = z, z_prev + 2 * h * f(t + m * h, z)
+    return z
+
+
+def _extrapolation_step(f, t, u, f_u, H, k, err_target):
+    """
+    Builds the extrapolation table row by row until the error estimate of a
+    column between k - 1 and k + 1 meets err_target
+
+    Row j (from 1) uses STEP_COUNTS[j - 1] substeps, and the Aitken-Neville
+    recursion T[j][i + 1] = T[j][i] + (T[j][i] - T[j - 1][i]) / ((n_j / n_j-i)^2 - 1)
+    raises the order by 2 per column. The difference of the last two entries of
+    row j estimates the error of the lower order one.
+
+    Returns
+    accepted: whether some row met the target
+    j: last row built
+    u_new: T[j][j], the highest order solution of row j
+    errors: scaled error estimate of each row built (index 0 and 1 unused)
+    """
+    table = []
+    errors = np.full(k + 2, np.inf)
+
+    for j in range(1, k + 2):
+        row = [modified_midpoint(f, t, u, f_u, H, STEP_COUNTS[j - 1])]
+        for i in range(1, j):
+            ratio = (STEP_COUNTS[j - 1] / STEP_COUNTS[j - 1 - i]) ** 2
+            row.append(row[i - 1] + (row[i - 1] - table[j - 2][i - 1]) / (ratio - 1))
+        table.append(row)
+
+        if j >= 2:
+            errors[j] = np.linalg.norm(row[-1] - row[-2]) / err_target
+            if j >= k - 1 and errors[j] <= 1:
+                return True, j, row[-1], errors
+
+    return False, k + 1, None, errors
+
+
+def _factor(error, j):
+    """
+    Step size change that would bring the error of row j to a safe fraction of the target
+    """
+    if not np.isfinite(error): #overflow in the table, shrink as much as allowed
+        return MIN_FACTOR
+    if error == 0:
+        return MAX_FACTOR
+    return min(MAX_FACTOR, max(MIN_FACTOR, 0.94 * (0.65 / error) ** (1 / (2 * j - 1))))
+
+
+def integrate_extrapolation(f, u_0, t_final, err_target, dt_0 = 0.01, stats = False):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 until time t_final with Gragg-Bulirsch-Stoer
+    extrapolation, adapting both the step size and the order
+    without plotting anything
+    Suited to smooth problems solved to high accuracy (err_target around 1e-10
+    to 1e-13), where it needs far fewer RHS calls than a fixed order method
+
+    Each step of size H runs the modified midpoint rule with 2, 4, 6, ... substeps
+    and extrapolates the results to zero substep size. The number of rows k is
+    chosen to minimize the RHS calls per unit time, as in Hairer, Norsett and
+    Wanner, Solving Ordinary Differential Equations I, section II.9.
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error (absolute 2-norm, as in ivp.integrate_adaptive)
+    dt_0: first trial time step
+    stats: if True, also return an ivp.SolverStats for the run
+
+    Returns
+    t_list: array of time points used, shape (n,)
+    u_list: array of solution at each time, shape (n,) or (n, d)
+    solver_stats: ivp.SolverStats, only returned when stats is True
+    """
+    #Setup variables
+    #----------------------------------
+    solver_stats = None
+    if stats:
+        solver_stats = ivp.SolverStats()
+        f = solver_stats.counted(f)
+
+    u = ivp._initial_state(u_0)
+    t = 0
+    H = min(dt_0, t_final)
+    k = int(min(MAX_ROWS - 1, max(2, -np.log10(err_target) * 0.6 + 1.5))) #target number of rows
+
+    t_list = ivp.GrowableArray()
+    u_list = ivp.GrowableArray(u.shape)
+    t_list.append(t)
+    u_list.append(u)
+    f_u = f(t, u)
+    #----------------------------------
+
+    #Integrate the IVP
+    #----------------------------------
+    while t < t_final:
+        if H < 10 * abs(np.nextafter(t, np.inf) - t):
+            raise Exception("Step size fell below the minimum at t = " + str(t))
+        H = min(H, t_final - t) #land exactly on t_final
+        accepted, j, u_new, errors = _extrapolation_step(f, t, u, f_u, H, k, err_target)
+
+        if not accepted: #retry from the same point with the step suggested by row k
+            if stats:
+                solver_stats.n_rejected += 1
+            H *= _factor(errors[k], k)
+            continue
+
+        t += H
+        u = np.asarray(u_new, dtype = float)
+        t_list.append(t)
+        u_list.append(u)
+        f_u = f(t, u)
+
+        #Choose the order and step with the least work per unit time
+        factors = {i: _factor(errors[i], i) for i in range(2, j + 1)}
+        work = {i: COSTS[i - 1] / factors[i] for i in factors}
+        k_new = j
+        if j > 2 and work[j - 1] < 0.9 * work[j]:
+            k_new = j - 1
+        H_new = H * factors[k_new]
+        if k_new == j and j >= k and j < MAX_ROWS - 1 and work[j] < 0.9 * work.get(j - 1, np.inf):
+            k_new = j + 1 #convergence was fast, try one more row with a longer step
+            H_new = H * factors[j] * COSTS[j] / COSTS[j - 1]
+        k = max(2, min(MAX_ROWS - 1, k_new))
+        H = H_new
+    #----------------------------------
+
+    t_list = t_list.trim()
+    u_list = u_list.trim()
+
+    if stats:
+        solver_stats.lap("time_step")
+        solver_stats.record_steps(t_list)
+        return t_list, u_list, solver_stats
+    return t_list, u_list
+
+
+def extrapolation_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with Gragg-Bulirsch-Stoer extrapolation
+    until time t_final
+    Allows for first order systems
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    plot_vars: variables to plot against time
+    phase_vars: variables to plot in phase diagram (list of ordered pairs)
+
+    Results
+    Plots the time series of chosen variables
+    Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty, see integrate_extrapolation
+
+    Returns
+    t_list: array of time points used
+    u_list: array of ordered tuples representing solution at each time
+    """
+    t_list, u_list = integrate_extrapolation(f, u_0, t_final, err_target)
+    ivp.plot_solution(t_list, u_list, plot_vars, phase_vars)
+
+    return t_list, u_list
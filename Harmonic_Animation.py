@@ -3,6 +3,7 @@ Solves, then animates solution to the real pendulum.
 """
 
 import Initial_Value_Problems as ivp
+import Trajectory_Cache as tc
 import manim as mn
 import numpy as np
 import math
@@ -23,9 +24,9 @@ class HarmonicOscillatorTime(mn.Scene):
         
         
         #Run the algorithm, but don't plot, just return solution
-        u_list = ivp.solve_ivp(f, u_0, dt, t_final, method, [], [])
-        u0_list = [u[0] for u in u_list] #Solution for angular position 
-        u1_list = [u[1] for u in u_list] #Solution for angular velocity
+        t_list, u_list = tc.cached(ivp.integrate_ivp, f, u_0, dt, t_final, method)
+        u0_list = u_list[:, 0] #Solution for angular position 
+        u1_list = u_list[:, 1] #Solution for angular velocity
         #------------------------------
         
         
@@ -130,9 +131,9 @@ class HarmonicOscillatorPhase(mn.Scene):
         
         
         #Run the algorithm, but don't plot, just return solution
-        u_list = ivp.solve_ivp(f, u_0, dt, t_final, method, [], [])
-        u0_list = [u[0] for u in u_list] #Solution for angular position 
-        u1_list = [u[1] for u in u_list] #Solution for angular velocity
+        t_list, u_list = tc.cached(ivp.integrate_ivp, f, u_0, dt, t_final, method)
+        u0_list = u_list[:, 0] #Solution for angular position 
+        u1_list = u_list[:, 1] #Solution for angular velocity
         #------------------------------
         
         
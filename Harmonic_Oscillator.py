@@ -4,6 +4,7 @@ Real pendulum simulation
 
 import numpy as np
 import Initial_Value_Problems as ivp
+import Symplectic_Solvers as sym
 
 def main():
     #Describe ODE and initial condition
@@ -23,8 +24,8 @@ def main():
     
     #With adaptive time step
     err_target = 1e-6
-    t_list, u_list = ivp.adaptive_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars)
-    dt_list = [t_list[i + 1] - t_list[i] for i in range(0, len(t_list) - 1)]
+    t_list, u_list, stats = ivp.adaptive_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars, stats = True)
+    print(stats) #step counts, step sizes and timings
     
     #With different initial values
     u_0_list = [np.array([np.pi / 4, 0]), np.array([np.pi / 2, 0]), np.array([3 * np.pi / 4, 0])]
@@ -33,6 +34,14 @@ def main():
     #With adaptive time step
     ivp.compare_adaptive(f, u_0_list, t_final, err_target, plot_vars, phase_vars)
     
+    #With a symplectic method, which keeps the energy bounded at a 5x larger step
+    velocity = lambda p: p
+    force = lambda q: -10 * np.sin(q)
+    H = lambda q,p: p ** 2 / 2 - 10 * np.cos(q)
+    t_list, u_list = sym.symplectic_ivp(velocity, force, 3 * np.pi / 4, 0., 5 * dt, t_final, "yoshida4", plot_vars, phase_vars)
+    E_list = sym.energy(H, u_list)
+    print("Largest energy error:", np.max(np.abs(E_list - E_list[0])))
+    
     
     
 if __name__ == "__main__":
@@ -2,245 +2,2048 @@
 Computational Math Module 5: Initial Value Problems
 """
 
+import os
+import time
+import pickle
 import numpy as np
-import matplotlib.pyplot as plt
+import Trajectory_Cache as tc
 
-def solve_ivp(f, u_0, dt, t_final, method, plot_vars, phase_vars):
+#Butcher tableaus (a, b, c) for the explicit Runge-Kutta methods
+#a is strictly lower triangular, b holds the weights, c the stage times
+#----------------------------------
+TABLEAUS = {
+    "euler": (np.array([[0.]]),
+              np.array([1.]),
+              np.array([0.])),
+    
+    "midpoint": (np.array([[0., 0.],
+                           [1/2, 0.]]),
+                 np.array([0., 1.]),
+                 np.array([0., 1/2])),
+    
+    "trapezoid": (np.array([[0., 0.],
+                            [1., 0.]]),
+                  np.array([1/2, 1/2]),
+                  np.array([0., 1.])),
+    
+    "ralston": (np.array([[0., 0.],
+                          [2/3, 0.]]),
+                np.array([1/4, 3/4]),
+                np.array([0., 2/3])),
+    
+    "classic_rk4": (np.array([[0., 0., 0., 0.],
+                              [1/2, 0., 0., 0.],
+                              [0., 1/2, 0., 0.],
+                              [0., 0., 1., 0.]]),
+                    np.array([1/6, 1/3, 1/3, 1/6]),
+                    np.array([0., 1/2, 1/2, 1.])),
+    
+    "equal_rk4": (np.array([[0., 0., 0., 0.],
+                            [1/3, 0., 0., 0.],
+                            [-1/3, 1., 0., 0.],
+                            [1., -1., 1., 0.]]),
+                  np.array([1/8, 3/8, 3/8, 1/8]),
+                  np.array([0., 1/3, 2/3, 1.])),
+}
+#----------------------------------
+
+
+def register_tableau(name, a, b, c):
+    """
+    Adds an explicit Runge-Kutta method to TABLEAUS so it can be used by name
+    
+    Parameters
+    name: method name to pass as method
+    a: s x s strictly lower triangular matrix of stage coefficients
+    b: s weights
+    c: s stage times (fractions of dt)
+    """
+    TABLEAUS[name] = _check_tableau(a, b, c)
+
+
+def _check_tableau(a, b, c):
+    """
+    Converts a Butcher tableau to float arrays and checks that it is explicit
+    """
+    a = np.atleast_2d( np.array(a, dtype = float) )
+    b = np.array(b, dtype = float)
+    c = np.array(c, dtype = float)
+    s = len(b)
+    
+    if a.shape != (s, s) or c.shape != (s,):
+        raise Exception("Tableau needs a of shape (s, s), b and c of length s")
+    if np.any( np.triu(a) != 0 ):
+        raise Exception("Tableau must be explicit (a strictly lower triangular)")
+    
+    return a, b, c
+
+
+def get_tableau(method):
+    """
+    Looks up the Butcher tableau for a method
+    
+    Parameters
+    method: name of a method in TABLEAUS, or a user-supplied tableau (a, b, c)
+    
+    Returns
+    a, b, c: the Butcher tableau as float arrays
+    """
+    if isinstance(method, str):
+        if method not in TABLEAUS:
+            raise Exception("Enter one of " + ", ".join("\"" + name + "\"" for name in list(TABLEAUS) + list(MULTISTEP_METHODS))
+                            + " or a Butcher tableau (a, b, c)")
+        return TABLEAUS[method]
+    
+    a, b, c = method
+    return _check_tableau(a, b, c)
+
+
+def _step_dtype(u):
+    """
+    Floating point type to step u in: its own for float32 or float64 states,
+    float64 for anything else
+    """
+    return np.result_type(np.asarray(u).dtype, np.float32)
+
+
+def _precision(dtype, step_dtype):
+    """
+    Checks the dtype and step_dtype options of the solvers
+    
+    Returns
+    dtype, step_dtype: as np.dtype objects
+    """
+    dtype = np.dtype(dtype)
+    step_dtype = np.dtype(step_dtype)
+    if dtype.kind != "f" or step_dtype.kind != "f":
+        raise Exception("dtype and step_dtype must be floating point types such as np.float32 or np.float64")
+    return dtype, step_dtype
+
+
+def _evaluate(f, t, u, out):
+    """
+    Writes f(t, u) into the array out, passing out to f when f can fill it in
+    place (f.writes_out, as for the functions of Symbolic_RHS.compile_rhs) so
+    no array is allocated for the result
+    """
+    if getattr(f, "writes_out", False):
+        f(t, u, out = out)
+    else:
+        out[...] = f(t, u)
+
+
+class RKWorkspace:
+    """
+    Stage buffers for one explicit Runge-Kutta method and state shape,
+    reused across steps so stepping does not allocate per step
+    (apart from whatever f itself returns, nothing if f writes into its out argument)
+    """
+    
+    def __init__(self, method, u):
+        """
+        Parameters
+        method: method name or Butcher tableau (a, b, c)
+        u: state to be stepped, used for shape and dtype
+        """
+        self.a, self.b, self.c = get_tableau(method)
+        s = len(self.b)
+        
+        self.k = np.empty( (s,) + np.shape(u), dtype = _step_dtype(u) ) #stage derivatives
+        self.u_stage = np.empty_like(self.k[0]) #state at which a stage is evaluated
+        self.work = np.empty_like(self.k[0]) #scratch for scaled stage derivatives
+        
+        #Non-zero coefficients only, so zeros in the tableau cost nothing
+        self.stage_coefs = [[(j, self.a[i, j]) for j in range(i) if self.a[i, j] != 0] for i in range(s)]
+        self.weights = [(j, self.b[j]) for j in range(s) if self.b[j] != 0]
+    
+    
+    def _combine(self, out, coefs, dt):
+        """
+        Adds dt * sum(coef * k[j]) to out in place
+        """
+        for j, coef in coefs:
+            np.multiply(self.k[j], coef * dt, out = self.work)
+            out += self.work
+    
+    
+    def stages(self, f, t, u, dt):
+        """
+        Evaluates every stage derivative of a step from (t, u) into self.k
+        """
+        for i, coefs in enumerate(self.stage_coefs):
+            if coefs:
+                np.copyto(self.u_stage, u)
+                self._combine(self.u_stage, coefs, dt)
+                _evaluate(f, t + self.c[i] * dt, self.u_stage, self.k[i, ...])
+            else:
+                _evaluate(f, t + self.c[i] * dt, u, self.k[i, ...])
+    
+    
+    def step(self, f, t, u, dt):
+        """
+        Advances u in place by one step of size dt from time t
+        """
+        self.stages(f, t, u, dt)
+        self._combine(u, self.weights, dt)
+    
+    
+    def start_derivative(self):
+        """
+        Returns f at the start of the last step (the first stage)
+        """
+        return self.k[0]
+
+
+#Adams multistep methods: (Adams-Bashforth weights, Adams-Moulton weights or None)
+#The Bashforth weights multiply f at t_n, t_n-1, ... and predict u at t_n+1
+#The Moulton weights multiply f at t_n+1, t_n, ... and correct the prediction
+#----------------------------------
+_AB = {2: [3/2, -1/2],
+       3: [23/12, -16/12, 5/12],
+       4: [55/24, -59/24, 37/24, -9/24],
+       5: [1901/720, -2774/720, 2616/720, -1274/720, 251/720]}
+
+_AM = {2: [1/2, 1/2],
+       3: [5/12, 8/12, -1/12],
+       4: [9/24, 19/24, -5/24, 1/24],
+       5: [251/720, 646/720, -264/720, 106/720, -19/720]}
+
+MULTISTEP_METHODS = {}
+for _order in range(2, 6):
+    MULTISTEP_METHODS["ab" + str(_order)] = (np.array(_AB[_order]), None)
+for _order in range(2, 6):
+    MULTISTEP_METHODS["abm" + str(_order)] = (np.array(_AB[_order]), np.array(_AM[_order]))
+#----------------------------------
+
+
+class MultistepWorkspace:
+    """
+    History of past derivatives for a fixed step Adams method, with the same
+    step interface as RKWorkspace
+    
+    "ab2" to "ab5" are the explicit Adams-Bashforth methods of that order
+    (1 RHS call per step). "abm2" to "abm5" are Adams-Bashforth-Moulton
+    predictor-corrector pairs in PECE mode (2 RHS calls per step, smaller error
+    constant). The first order - 1 steps, before enough history exists, are
+    taken with classic_rk4. The step size must stay the same on every step.
+    """
+    
+    def __init__(self, method, u):
+        """
+        Parameters
+        method: name of a method in MULTISTEP_METHODS
+        u: state to be stepped, used for shape and dtype
+        """
+        self.predictor, self.corrector = MULTISTEP_METHODS[method]
+        self.order = len(self.predictor)
+        self.starter = RKWorkspace("classic_rk4", u)
+        
+        #history[j] is f at t_n-j; the list is rotated so no array is reallocated
+        self.history = [np.empty(np.shape(u), dtype = _step_dtype(u)) for j in range(self.order)]
+        self.n_known = 0 #entries of history that are filled
+        self.u_predict = np.empty_like(self.history[0])
+        self.work = np.empty_like(self.history[0])
+    
+    
+    def _push(self, f, t, u):
+        """
+        Adds f(t, u) at the newest time point to the front of the history
+        """
+        newest = self.history.pop()
+        _evaluate(f, t, u, newest)
+        self.history.insert(0, newest)
+        self.n_known = min(self.n_known + 1, len(self.history))
+    
+    
+    def _combine(self, out, weights, dt):
+        """
+        Adds dt * sum(weights[j] * history[j]) to out in place
+        """
+        for j, weight in enumerate(weights):
+            np.multiply(self.history[j], weight * dt, out = self.work)
+            out += self.work
+    
+    
+    def step(self, f, t, u, dt):
+        """
+        Advances u in place by one step of size dt from time t
+        """
+        if self.n_known == 0:
+            self._push(f, t, u)
+        
+        if self.n_known < self.order: #not enough history yet, take a Runge-Kutta step
+            self.starter.step(f, t, u, dt)
+            self._push(f, t + dt, u)
+            return
+        
+        #Predict with Adams-Bashforth
+        np.copyto(self.u_predict, u)
+        self._combine(self.u_predict, self.predictor, dt)
+        
+        if self.corrector is None:
+            np.copyto(u, self.u_predict)
+        else:
+            #Correct with Adams-Moulton, using f at the prediction for the new point
+            _evaluate(f, t + dt, self.u_predict, self.work)
+            self.work *= self.corrector[0] * dt
+            u += self.work
+            self._combine(u, self.corrector[1:], dt)
+        
+        self._push(f, t + dt, u)
+    
+    
+    def start_derivative(self):
+        """
+        Returns f at the start of the last step
+        """
+        return self.history[1]
+
+
+def make_workspace(method, u):
+    """
+    Returns the workspace that steps a fixed step method: a MultistepWorkspace
+    for a name in MULTISTEP_METHODS, otherwise an RKWorkspace
+    """
+    if isinstance(method, str) and method in MULTISTEP_METHODS:
+        return MultistepWorkspace(method, u)
+    return RKWorkspace(method, u)
+
+
+class SolverStats:
+    """
+    Counters and timings of a solver run, returned by the solvers when stats = True
+    
+    Attributes
+    n_evals: RHS evaluations (a batched call for a whole ensemble counts once)
+    n_steps: accepted steps (summed over the runs of an ensemble solved member by member)
+    n_rejected: trial steps rejected by the error control
+    n_jac: Jacobian evaluations (implicit solvers only)
+    n_lu: LU factorizations (implicit solvers only)
+    dt_min, dt_max, dt_mean: smallest, largest and mean accepted step size
+    time_step: wall time spent computing steps, in seconds
+    time_storage: wall time spent allocating and writing the output arrays
+    time_plot: wall time spent plotting (only the plotting wrappers plot)
+    time_total: sum of the three timings
+    dtype: precision the solution is stored in
+    step_dtype: precision the steps are computed in
+    """
+    def __init__(self):
+        self.n_evals = 0
+        self.n_steps = 0
+        self.n_rejected = 0
+        self.n_jac = 0
+        self.n_lu = 0
+        
+        self.dt_min = np.inf
+        self.dt_max = 0.
+        self.dt_sum = 0.
+        
+        self.time_step = 0.
+        self.time_storage = 0.
+        self.time_plot = 0.
+        self.mark = time.perf_counter()
+        
+        self.dtype = "float64"
+        self.step_dtype = "float64"
+    
+    
+    def set_precision(self, dtype, step_dtype):
+        """
+        Records the precision of the run
+        """
+        self.dtype = np.dtype(dtype).name
+        self.step_dtype = np.dtype(step_dtype).name
+    
+    
+    def counted(self, f):
+        """
+        Wraps f so that every call is added to n_evals
+        """
+        if getattr(f, "writes_out", False):
+            def f_counted(t, u, out = None):
+                self.n_evals += 1
+                return f(t, u, out)
+            f_counted.writes_out = True
+            return f_counted
+        
+        def f_counted(t, u):
+            self.n_evals += 1
+            return f(t, u)
+        return f_counted
+    
+    
+    def start(self):
+        """
+        Starts timing from now
+        """
+        self.mark = time.perf_counter()
+    
+    
+    def lap(self, phase):
+        """
+        Adds the time since the last start or lap to phase ("time_step", "time_storage" or "time_plot")
+        """
+        now = time.perf_counter()
+        setattr(self, phase, getattr(self, phase) + now - self.mark)
+        self.mark = now
+    
+    
+    def record_steps(self, t_list):
+        """
+        Adds the accepted steps between the points of t_list
+        """
+        if len(t_list) < 2:
+            return
+        dt_list = np.diff(t_list)
+        self.n_steps += len(dt_list)
+        self.dt_min = min(self.dt_min, np.min(dt_list))
+        self.dt_max = max(self.dt_max, np.max(dt_list))
+        self.dt_sum += np.sum(dt_list)
+    
+    
+    def merge(self, other):
+        """
+        Adds the counts and timings of another run, e.g. another member of an ensemble
+        """
+        for name in ["n_evals", "n_steps", "n_rejected", "n_jac", "n_lu", "dt_sum",
+                     "time_step", "time_storage", "time_plot"]:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.dt_min = min(self.dt_min, other.dt_min)
+        self.dt_max = max(self.dt_max, other.dt_max)
+    
+    
+    @property
+    def dt_mean(self):
+        return self.dt_sum / self.n_steps if self.n_steps else np.nan
+    
+    
+    @property
+    def time_total(self):
+        return self.time_step + self.time_storage + self.time_plot
+    
+    
+    def __repr__(self):
+        lines = ["RHS evaluations: " + str(self.n_evals),
+                 "steps: " + str(self.n_steps) + " accepted, " + str(self.n_rejected) + " rejected",
+                 "dt: min {:.3g}, max {:.3g}, mean {:.3g}".format(self.dt_min, self.dt_max, self.dt_mean),
+                 "time (s): stepping {:.4f}, storage {:.4f}, plotting {:.4f}".format(self.time_step,
+                                                                                   self.time_storage, self.time_plot)]
+        if self.n_jac or self.n_lu:
+            lines.insert(2, "Jacobians: " + str(self.n_jac) + ", LU factorizations: " + str(self.n_lu))
+        if self.dtype != "float64" or self.step_dtype != "float64":
+            lines.append("precision: " + self.dtype + " storage, " + self.step_dtype + " stepping")
+        return "\n".join(lines)
+
+
+def _fixed_step_loop(f, u, t_list, dt, method, u_list, solver_stats = None, step_hook = None,
+                     i_start = 0, workspace = None, save = None):
+    """
+    Advances u in place through the time points t_list using a fixed step dt,
+    writing the state after step i into u_list[i + 1]
+    Works for any array shape of u, so a batch of states can be stepped at once
+    
+    Parameters
+    f: function of t and u where f = du/dt
+    u: current state as an np.ndarray (0-d for a scalar equation), updated in place
+    t_list: time points, t_list[i] is the start of step i
+    dt: time step
+    method: name of a method in TABLEAUS or MULTISTEP_METHODS, or a Butcher tableau (a, b, c)
+    u_list: output array (or view) indexed by step
+    solver_stats: SolverStats that stepping and storage times are added to, or None
+    step_hook: function hook(t, u, dt) called after every step, or None
+    i_start: step to start from, when resuming from a checkpoint (u is then the state at t_list[i_start])
+    workspace: workspace to step with, when resuming from a checkpoint, or None for a new one
+    save: function save(i, workspace) called after every step i - 1 is stored, or None
+          (used to write checkpoints)
+    """
+    n = len(t_list) - 1
+    if workspace is None:
+        workspace = make_workspace(method, u)
+    
+    if solver_stats is None and step_hook is None and save is None:
+        for i in range(i_start, n):
+            workspace.step(f, t_list[i], u, dt)
+            u_list[i + 1] = u
+        return
+    
+    for i in range(i_start, n):
+        workspace.step(f, t_list[i], u, dt)
+        if solver_stats is not None:
+            solver_stats.lap("time_step")
+        u_list[i + 1] = u
+        if solver_stats is not None:
+            solver_stats.lap("time_storage")
+        if step_hook is not None:
+            step_hook(t_list[i + 1], u, dt)
+            if solver_stats is not None: #the hook's own time is not counted
+                solver_stats.start()
+        if save is not None:
+            save(i + 1, workspace)
+
+
+#Embedded Butcher tableaus (a, b, b_hat, c, order) for the adaptive solvers
+#b gives the propagated solution, b_hat the embedded lower order solution,
+#order is the order of the embedded solution (used by the step controller)
+#----------------------------------
+EMBEDDED_TABLEAUS = {
+    "bogacki_shampine": (np.array([[0., 0., 0., 0.],
+                                   [1/2, 0., 0., 0.],
+                                   [0., 3/4, 0., 0.],
+                                   [2/9, 1/3, 4/9, 0.]]),
+                         np.array([2/9, 1/3, 4/9, 0.]),
+                         np.array([7/24, 1/4, 1/3, 1/8]),
+                         np.array([0., 1/2, 3/4, 1.]),
+                         2),
+    
+    "dopri5": (np.array([[0., 0., 0., 0., 0., 0., 0.],
+                         [1/5, 0., 0., 0., 0., 0., 0.],
+                         [3/40, 9/40, 0., 0., 0., 0., 0.],
+                         [44/45, -56/15, 32/9, 0., 0., 0., 0.],
+                         [19372/6561, -25360/2187, 64448/6561, -212/729, 0., 0., 0.],
+                         [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656, 0., 0.],
+                         [35/384, 0., 500/1113, 125/192, -2187/6784, 11/84, 0.]]),
+               np.array([35/384, 0., 500/1113, 125/192, -2187/6784, 11/84, 0.]),
+               np.array([5179/57600, 0., 7571/16695, 393/640, -92097/339200, 187/2100, 1/40]),
+               np.array([0., 1/5, 3/10, 4/5, 8/9, 1., 1.]),
+               4),
+}
+#----------------------------------
+
+
+def get_embedded_tableau(method):
+    """
+    Looks up the embedded Butcher tableau for an adaptive method
+    
+    Parameters
+    method: name of a method in EMBEDDED_TABLEAUS, or a user-supplied
+            embedded tableau (a, b, b_hat, c, order)
+    
+    Returns
+    a, b, b_hat, c, order: the embedded tableau
+    """
+    if isinstance(method, str):
+        if method not in EMBEDDED_TABLEAUS:
+            raise Exception("Enter one of " + ", ".join("\"" + name + "\"" for name in EMBEDDED_TABLEAUS)
+                            + " or an embedded tableau (a, b, b_hat, c, order)")
+        return EMBEDDED_TABLEAUS[method]
+    
+    a, b, b_hat, c, order = method
+    a, b, c = _check_tableau(a, b, c)
+    return a, b, np.array(b_hat, dtype = float), c, order
+
+
+class EmbeddedRKWorkspace(RKWorkspace):
+    """
+    Stage buffers for an embedded Runge-Kutta pair
+    Keeps f(t, u) at the start of the step between attempts, so a rejected
+    step and (for first-same-as-last pairs) the next step reuse it
+    """
+    
+    def __init__(self, method, u):
+        """
+        Parameters
+        method: method name or embedded tableau (a, b, b_hat, c, order)
+        u: state to be stepped, used for shape and dtype
+        """
+        a, b, b_hat, c, self.order = get_embedded_tableau(method)
+        RKWorkspace.__init__(self, (a, b, c), u)
+        s = len(b)
+        
+        self.error_weights = [(j, b[j] - b_hat[j]) for j in range(s) if b[j] != b_hat[j]]
+        
+        #First same as last: the last stage is evaluated at the new solution
+        self.fsal = c[-1] == 1 and np.array_equal(a[-1, :-1], b[:-1]) and b[-1] == 0
+        self.have_k0 = False #whether k[0] holds f at the current (t, u)
+        
+        self.u_new = np.empty_like(self.k[0])
+        self.err = np.empty_like(self.k[0])
+        self.n_evals = 0 #number of calls to f
+    
+    
+    def stages(self, f, t, u, dt):
+        """
+        Evaluates every stage derivative of a step from (t, u) into self.k,
+        skipping the first stage when it is already known
+        """
+        for i, coefs in enumerate(self.stage_coefs):
+            if i == 0 and self.have_k0:
+                continue
+            if coefs:
+                np.copyto(self.u_stage, u)
+                self._combine(self.u_stage, coefs, dt)
+                _evaluate(f, t + self.c[i] * dt, self.u_stage, self.k[i, ...])
+            else:
+                _evaluate(f, t + self.c[i] * dt, u, self.k[i, ...])
+            self.n_evals += 1
+        self.have_k0 = True
+    
+    
+    def attempt(self, f, t, u, dt):
+        """
+        Computes a trial step from (t, u) into self.u_new without changing u
+        
+        Returns
+        err: norm of the local error estimate of the trial step
+        """
+        self.stages(f, t, u, dt)
+        
+        np.copyto(self.u_new, u)
+        self._combine(self.u_new, self.weights, dt)
+        
+        self.err.fill(0)
+        self._combine(self.err, self.error_weights, dt)
+        
+        return np.linalg.norm(self.err)
+    
+    
+    def accept(self, u):
+        """
+        Moves the trial step into u, carrying the last stage over when possible
+        """
+        np.copyto(u, self.u_new)
+        if self.fsal:
+            self.k[0] = self.k[-1]
+        else:
+            self.have_k0 = False
+    
+    
+    def derivative(self, f, t, u):
+        """
+        Returns f(t, u) at the current point, evaluating it only if it is not
+        already known (it is then reused as the first stage of the next step)
+        """
+        if not self.have_k0:
+            _evaluate(f, t, u, self.k[0, ...])
+            self.n_evals += 1
+            self.have_k0 = True
+        return self.k[0]
+
+
+class GrowableArray:
+    """
+    Contiguous array for results of unknown length, e.g. the points of an
+    adaptive solver. Capacity doubles when full, so appending is amortized
+    O(1) without a Python object per element
+    """
+    
+    def __init__(self, item_shape = (), capacity = 1024, dtype = float):
+        """
+        Parameters
+        item_shape: shape of one appended item, () for scalars
+        capacity: number of items to allocate room for initially
+        dtype: type of the items
+        """
+        self.data = np.empty( (capacity,) + tuple(item_shape), dtype = dtype )
+        self.n = 0
+    
+    
+    def append(self, item):
+        """
+        Copies item into the next free row, growing the storage if needed
+        """
+        if self.n == len(self.data):
+            grown = np.empty( (2 * len(self.data),) + self.data.shape[1:], dtype = self.data.dtype )
+            grown[:self.n] = self.data
+            self.data = grown
+        self.data[self.n] = item
+        self.n += 1
+    
+    
+    def trim(self):
+        """
+        Returns the filled part as an array, releasing the unused capacity
+        """
+        self.data.resize( (self.n,) + self.data.shape[1:], refcheck = False )
+        return self.data
+
+
+def hermite(s, h, u0, du0, u1, du1):
+    """
+    Evaluates the cubic Hermite interpolant on a step of length h
+    
+    Parameters
+    s: fraction of the step, 0 at the start and 1 at the end
+    h: step length
+    u0, du0: solution and derivative at the start of the step
+    u1, du1: solution and derivative at the end of the step
+    
+    Returns
+    u: interpolated solution
+    """
+    h00 = (1 + 2 * s) * (1 - s) ** 2
+    h10 = s * (1 - s) ** 2
+    h01 = s ** 2 * (3 - 2 * s)
+    h11 = s ** 2 * (s - 1)
+    
+    return h00 * u0 + h10 * h * du0 + h01 * u1 + h11 * h * du1
+
+
+class DenseOutput:
+    """
+    Continuous solution built from the points of an adaptive solver, using
+    the cubic Hermite interpolant through u and du/dt at both ends of each step
+    Evaluate it by calling it with a time or an array of times
+    """
+    
+    def __init__(self, t_list, u_list, du_list):
+        """
+        Parameters
+        t_list: increasing time points
+        u_list: solution at each time point
+        du_list: f(t, u) at each time point
+        """
+        self.t = np.asarray(t_list, dtype = float)
+        self.u = np.asarray(u_list, dtype = float)
+        self.du = np.asarray(du_list, dtype = float).reshape(self.u.shape)
+    
+    
+    def __call__(self, t):
+        """
+        Evaluates the solution at time(s) t within [t_list[0], t_list[-1]]
+        
+        Parameters
+        t: time or array of times
+        
+        Returns
+        u: solution at t, with the time axis first when t is an array
+        """
+        t = np.asarray(t, dtype = float)
+        if np.any(t < self.t[0]) or np.any(t > self.t[-1]):
+            raise Exception("t not within time range")
+        
+        #Step i contains t, found for all t at once
+        i = np.clip(np.searchsorted(self.t, t, side = "right") - 1, 0, len(self.t) - 2)
+        h = self.t[i + 1] - self.t[i]
+        s = (t - self.t[i]) / h
+        
+        #Hermite basis functions, shaped to broadcast over solution components
+        extra_dims = (slice(None),) * t.ndim + (None,) * (self.u.ndim - 1)
+        return hermite(s[extra_dims], h[extra_dims], self.u[i], self.du[i], self.u[i + 1], self.du[i + 1])
+
+
+class StreamSampler:
+    """
+    Collects the points of a running solver into fixed size chunks, so
+    memory is bounded by the chunk size rather than the time horizon
+    
+    Points are passed in time order with push(); every call returns the
+    list of chunks (t_chunk, u_chunk) that became full, usually empty.
+    Exactly one of the output modes applies:
+    every stride-th point (stride = 1 keeps all points, the last point is always kept),
+    samples at the times t_eval (Hermite interpolation between points),
+    or only the last point (keep_last)
+    """
+    
+    def __init__(self, item_shape, chunk_size = 1024, t_eval = None, stride = 1, keep_last = False, dtype = float):
+        """
+        Parameters
+        item_shape: shape of one solution point, () for scalars
+        chunk_size: number of points per chunk
+        t_eval: increasing times at which to sample the solution, or None
+        stride: keep every stride-th point when t_eval is None
+        keep_last: if True, only the final point is output
+        dtype: type of the output chunks of the solution
+        """
+        self.t_chunk = np.empty(chunk_size)
+        self.u_chunk = np.empty( (chunk_size,) + tuple(item_shape), dtype = dtype )
+        self.n = 0 #points in the current chunk
+        
+        self.t_eval = None if t_eval is None else np.asarray(t_eval, dtype = float)
+        self.i_eval = 0 #next entry of t_eval to output
+        self.stride = stride
+        self.keep_last = keep_last
+        self.count = 0 #points pushed so far
+        
+        #t_eval needs du/dt at each point and the previous point for interpolation
+        self.needs_derivative = self.t_eval is not None and not keep_last
+        self.t_prev = None
+        self.u_prev = np.empty(item_shape)
+        self.du_prev = np.empty(item_shape)
+    
+    
+    def _emit(self, t, u, chunks):
+        """
+        Writes one output point, moving the chunk to chunks when it is full
+        """
+        self.t_chunk[self.n] = t
+        self.u_chunk[self.n] = u
+        self.n += 1
+        if self.n == len(self.t_chunk):
+            chunks.append( (self.t_chunk.copy(), self.u_chunk.copy()) )
+            self.n = 0
+    
+    
+    def push(self, t, u, du = None, final = False):
+        """
+        Adds the solver point (t, u), copying it
+        
+        Parameters
+        t: time of the point
+        u: solution at t
+        du: f(t, u), only needed when needs_derivative is True
+        final: True for the last point of the integration
+        
+        Returns
+        chunks: list of full chunks (t_chunk, u_chunk)
+        """
+        chunks = []
+        
+        if self.keep_last:
+            if final:
+                self._emit(t, u, chunks)
+        
+        elif self.t_eval is not None:
+            while self.i_eval < len(self.t_eval) and self.t_eval[self.i_eval] <= t:
+                t_out = self.t_eval[self.i_eval]
+                if self.t_prev is None or t_out <= self.t_prev:
+                    u_out = u if self.t_prev is None else self.u_prev
+                else:
+                    h = t - self.t_prev
+                    u_out = hermite((t_out - self.t_prev) / h, h, self.u_prev, self.du_prev, u, du)
+                self._emit(t_out, u_out, chunks)
+                self.i_eval += 1
+            self.t_prev = t
+            self.u_prev[...] = u
+            self.du_prev[...] = du
+        
+        elif self.count % self.stride == 0 or final:
+            self._emit(t, u, chunks)
+        
+        self.count += 1
+        return chunks
+    
+    
+    def flush(self):
+        """
+        Returns the last, partially filled chunk (as a list, empty if there is none)
+        """
+        if self.n == 0:
+            return []
+        chunk = (self.t_chunk[:self.n].copy(), self.u_chunk[:self.n].copy())
+        self.n = 0
+        return [chunk]
+
+
+def _locate_crossing(g, g0, g1, t0, u0, du0, t1, u1, du1):
+    """
+    Finds the root of g along the Hermite interpolant of the step from
+    t0 to t1 with the Illinois variant of regula falsi, given g0 = g(t0, u0)
+    and g1 = g(t1, u1) of opposite signs
+    
+    Returns
+    t, u: time of the root and the interpolated solution there
+    """
+    h = t1 - t0
+    u_at = lambda t: hermite((t - t0) / h, h, u0, du0, u1, du1)
+    
+    a, b = t0, t1
+    g_a, g_b = g0, g1
+    side = 0
+    for i in range(100):
+        t = (a * g_b - b * g_a) / (g_b - g_a)
+        if b - a <= 4 * np.finfo(float).eps * max(1, abs(b)):
+            break
+        g_t = g(t, u_at(t))
+        if g_t == 0:
+            break
+        if np.sign(g_t) == np.sign(g_b):
+            b, g_b = t, g_t
+            if side == 1: #same end kept twice, halve the other end's value
+                g_a /= 2
+            side = 1
+        else:
+            a, g_a = t, g_t
+            if side == -1:
+                g_b /= 2
+            side = -1
+    
+    return t, u_at(t)
+
+
+class EventTracker:
+    """
+    Watches event functions g(t, u) for zero crossings between solver points
+    
+    An event function may carry the attributes
+    terminal: if True, integration stops at the first crossing (default False)
+    direction: only count crossings where g increases (+1) or decreases (-1),
+               0 counts both (default 0)
+    Crossing times are located by root-finding on the cubic Hermite
+    interpolant of the step, so they are accurate between step points.
+    """
+    
+    def __init__(self, events, t, u):
+        """
+        Parameters
+        events: list of event functions g(t, u)
+        t, u: initial point of the integration
+        """
+        self.events = events
+        self.terminal = [getattr(g, "terminal", False) for g in events]
+        self.direction = [getattr(g, "direction", 0) for g in events]
+        self.g_prev = [g(t, u) for g in events]
+        self.t_events = [[] for g in events] #crossing times for each event
+        self.u_events = [[] for g in events] #solution at the crossings
+    
+    
+    def check(self, t0, u0, du0, t1, u1, derivative):
+        """
+        Looks for crossings in the step from (t0, u0) to (t1, u1)
+        
+        Parameters
+        t0, u0, du0: start of the step and f there
+        t1, u1: end of the step
+        derivative: function returning f(t1, u1), only called if a crossing is found
+        
+        Returns
+        stop: None, or (t, u) of the earliest terminal crossing in the step
+        """
+        g_new = [g(t1, u1) for g in self.events]
+        found = []
+        du1 = None
+        
+        for j, g in enumerate(self.events):
+            g0, g1 = self.g_prev[j], g_new[j]
+            crossed = (g0 < 0 and g1 >= 0) or (g0 > 0 and g1 <= 0)
+            if not crossed or self.direction[j] * (g1 - g0) < 0:
+                continue
+            if du1 is None:
+                du1 = derivative()
+            t_event, u_event = _locate_crossing(g, g0, g1, t0, u0, du0, t1, u1, du1)
+            found.append( (t_event, j, u_event) )
+        
+        self.g_prev = g_new
+        
+        #Record crossings up to and including the first terminal one
+        stop = None
+        for t_event, j, u_event in sorted(found, key = lambda item: item[0]):
+            self.t_events[j].append(t_event)
+            self.u_events[j].append(u_event)
+            if self.terminal[j]:
+                stop = (t_event, u_event)
+                break
+        
+        return stop
+    
+    
+    def results(self):
+        """
+        Returns
+        t_events: list with an array of crossing times for each event
+        u_events: list with an array of solutions at the crossings for each event
+        """
+        return [np.array(t) for t in self.t_events], [np.array(u) for u in self.u_events]
+
+
+def _initial_state(u_0, dtype = float):
+    """
+    Copies an initial value into a float array that can be stepped in place
+    (0-d for a scalar equation)
+    """
+    if isinstance(u_0, float):
+        return np.array(u_0, dtype = dtype)
+    elif isinstance(u_0, np.ndarray):
+        return np.array(u_0, dtype = dtype)
+    else:
+        raise Exception("Initial condition must be float or np.ndarray of floats")
+
+
+def _allocate_output(shape, out_file, resume = False, dtype = float):
+    """
+    Allocates the array a fixed step solution is written into
+    
+    Parameters
+    shape: shape of the full solution array
+    out_file: None to keep the solution in memory, or the path of a .npy file
+              that is created (or overwritten) and memory-mapped, so that each
+              step is written straight to disk and pages are only kept in RAM
+              while the operating system needs them
+    resume: if True, reopen the existing out_file of an interrupted run
+            instead of overwriting it (see Checkpoint)
+    dtype: type of the stored solution, e.g. np.float32 to halve its size
+    
+    Returns
+    u_list: np.ndarray, or np.memmap backed by out_file
+    """
+    if out_file is None:
+        return np.empty(shape, dtype = dtype)
+    if resume:
+        u_list = np.lib.format.open_memmap(out_file, mode = "r+")
+        if u_list.shape != tuple(shape) or u_list.dtype != dtype:
+            raise Exception("out_file " + out_file + " does not match the checkpoint")
+        return u_list
+    return np.lib.format.open_memmap(out_file, mode = "w+", dtype = dtype, shape = shape)
+
+
+def _finish_output(u_list):
+    """
+    Writes any pages still held in memory out to a memory-mapped solution
+    """
+    if isinstance(u_list, np.memmap):
+        u_list.flush()
+
+
+def open_solution(out_file):
+    """
+    Reopens a solution written with out_file without reading it into memory
+    
+    Parameters
+    out_file: path of the .npy file
+    
+    Returns
+    u_list: read-only np.memmap with the same layout as the solver returned
+    """
+    return np.load(out_file, mmap_mode = "r")
+
+
+class Checkpoint:
+    """
+    Snapshots of a running solver, written to a file every few minutes so
+    that a run that is killed can be resumed where it stopped
+    
+    A snapshot holds everything the solver needs to continue (time, state,
+    step size, the workspace with its stage or multistep history, and the
+    output so far), so the resumed run takes exactly the same steps and its
+    result is bit-identical to an uninterrupted run.
+    
+    The output grows with the run, so it is kept apart as series: each
+    snapshot appends only the rows added since the previous one to the file
+    path + ".rows", and every snapshot costs the same however long the run.
+    The rest of the state is small; it is written to a temporary file and
+    renamed over path once the new rows are on disk, so a crash while
+    writing leaves the previous snapshot intact (rows past it are dropped on
+    resume).
+    
+    The solvers create a Checkpoint when given checkpoint = path: if the file
+    exists they resume from it, and they delete it once the run completes.
+    A snapshot is only used for the same problem (same f, initial value and
+    settings, see Trajectory_Cache.trajectory_key).
+    """
+    
+    def __init__(self, path, key, every = 60):
+        """
+        Parameters
+        path: file to keep the snapshot in
+        key: content address of the problem being solved
+        every: wall time in seconds between snapshots
+        """
+        self.path = path
+        self.rows_path = path + ".rows"
+        self.key = key
+        self.every = every
+        self.last = time.perf_counter()
+        self.saved = {} #number of rows of each series in rows_path
+        self.rows_size = 0 #bytes of rows_path that belong to the snapshot
+    
+    
+    def load(self):
+        """
+        Returns the saved state as a dict, or None if there is no snapshot yet
+        Each series is rebuilt from its rows, as an array (or a list if it was saved as one)
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as file:
+            state = pickle.load(file)
+        if state["key"] != self.key:
+            raise Exception("Checkpoint " + self.path + " is from a different problem, delete it to start over")
+        self.saved = state["saved"]
+        self.rows_size = state["rows_size"]
+        
+        pieces = {name: [] for name in self.saved}
+        if self.rows_size > 0:
+            with open(self.rows_path, "r+b") as file:
+                while file.tell() < self.rows_size:
+                    for name, rows in pickle.load(file).items():
+                        pieces[name].append(rows)
+                file.truncate(self.rows_size) #rows written after the snapshot
+        for name, rows in pieces.items():
+            if isinstance(rows[0], list):
+                state[name] = [row for piece in rows for row in piece]
+            else:
+                state[name] = np.concatenate(rows)
+        return state
+    
+    
+    def due(self):
+        """
+        Returns True once every seconds have passed since the last snapshot
+        """
+        return time.perf_counter() - self.last >= self.every
+    
+    
+    def save(self, state, series = None):
+        """
+        Writes a snapshot: the rows of each series added since the last one
+        are appended to rows_path, then the dict state replaces the file atomically
+        
+        Parameters
+        state: dict of the solver state
+        series: dict of the output arrays (or lists) filled so far, by name;
+                only the rows past those already saved are written
+        """
+        if series:
+            record = {name: rows[self.saved.get(name, 0):] for name, rows in series.items()}
+            with open(self.rows_path, "ab" if self.rows_size > 0 else "wb") as file:
+                pickle.dump(record, file, protocol = pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno()) #the rows are on disk before the state that counts them
+                self.rows_size = file.tell()
+            self.saved.update( (name, len(rows)) for name, rows in series.items() )
+        
+        state = dict(state, key = self.key, saved = self.saved, rows_size = self.rows_size)
+        temp_path = self.path + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(state, file, protocol = pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno()) #on disk before it replaces the previous snapshot
+        os.replace(temp_path, self.path)
+        self.last = time.perf_counter()
+    
+    
+    def remove(self):
+        """
+        Deletes the snapshot once the run has completed
+        """
+        for path in (self.path, self.rows_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _restore_stats(solver_stats, saved):
+    """
+    Copies the counters and timings of a checkpointed run into solver_stats
+    (which f is already counted into), restarting its clock
+    """
+    if solver_stats is not None and saved is not None:
+        solver_stats.__dict__.update(saved.__dict__)
+        solver_stats.start()
+
+
+def _growable(array):
+    """
+    Makes a GrowableArray holding the rows of array, to continue appending to
+    """
+    grown = GrowableArray(array.shape[1:], max(1024, 2 * len(array)), array.dtype)
+    grown.data[:len(array)] = array
+    grown.n = len(array)
+    return grown
+
+
+def integrate_ivp(f, u_0, dt, t_final, method, events = None, out_file = None, stats = False, step_hook = None,
+                  dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final
+    without plotting anything
+    Allows for first-order systems
+    
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    dt: time step
+    t_final: final time
+    method: name of a method in TABLEAUS ("euler", "midpoint", "trapezoid", "ralston",
+            "classic_rk4", "equal_rk4", or registered with register_tableau),
+            a Butcher tableau (a, b, c), or a multistep method in MULTISTEP_METHODS
+            ("ab2" to "ab5", "abm2" to "abm5")
+    events: list of event functions g(t, u), see EventTracker
+    out_file: path of a .npy file to write the solution into as it is computed,
+              see _allocate_output (if a terminal event fires, the file keeps
+              all n + 1 rows and u_list is a view of the ones that were used)
+    stats: if True, also return a SolverStats for the run
+    step_hook: function hook(t, u, dt) called after every step, e.g. for a
+               profiler; u is the live state and must not be modified
+    dtype: type the solution is stored in, e.g. np.float32 to halve its memory
+    step_dtype: type the steps are computed in; np.float64 keeps the accuracy of
+                the method, np.float32 also steps in single precision (less
+                memory traffic for large ensembles, relative errors of about 1e-7 at best)
+    
+    Returns
+    t_list: array of time points (ends at the crossing if a terminal event fired)
+    u_list: array of ordered tuples representing solution at each time, of type dtype,
+            an np.memmap of out_file if it is given
+    t_events: list of arrays of crossing times, only returned when events is given
+    u_events: list of arrays of solutions at the crossings, only returned when events is given
+    solver_stats: SolverStats, only returned when stats is True
+    """
+    #Setup variables
+    #----------------------------------
+    dtype, step_dtype = _precision(dtype, step_dtype)
+    solver_stats = None
+    if stats:
+        solver_stats = SolverStats()
+        solver_stats.set_precision(dtype, step_dtype)
+        f = solver_stats.counted(f)
+    
+    n = int(t_final / dt) #number of steps to take, total points is n + 1
+    
+    u = _initial_state(u_0, step_dtype)
+    u_list = _allocate_output( (n + 1,) + u.shape, out_file, dtype = dtype )
+    
+    t_list = np.linspace(0, t_final, n + 1)
+    u_list[0] = u_0
+    if stats:
+        solver_stats.lap("time_storage")
+    #----------------------------------
+    
+    #Integrate the IVP
+    #----------------------------------
+    if events is None:
+        _fixed_step_loop(f, u, t_list, dt, method, u_list, solver_stats, step_hook)
+        results = (t_list, u_list)
+    else:
+        tracker = EventTracker(events, t_list[0], u)
+        workspace = make_workspace(method, u)
+        
+        for i in range(n):
+            workspace.step(f, t_list[i], u, dt)
+            stop = tracker.check(t_list[i], u_list[i], workspace.start_derivative(), t_list[i + 1], u,
+                                 lambda: f(t_list[i + 1], u))
+            if stop is not None: #end the solution at the terminal crossing
+                t_list = t_list[:i + 2].copy()
+                u_list = u_list[:i + 2] if out_file is not None else u_list[:i + 2].copy()
+                t_list[i + 1], u_list[i + 1] = stop
+                break
+            if stats:
+                solver_stats.lap("time_step")
+            u_list[i + 1] = u
+            if stats:
+                solver_stats.lap("time_storage")
+            if step_hook is not None:
+                step_hook(t_list[i + 1], u, dt)
+                if stats:
+                    solver_stats.start()
+        
+        results = (t_list, u_list) + tracker.results()
+    
+    _finish_output(u_list)
+    #----------------------------------
+    
+    if stats:
+        solver_stats.lap("time_storage")
+        solver_stats.record_steps(t_list)
+        results += (solver_stats,)
+    return results
+
+
+def _adaptive_steps(f, u, t_final, err_target, workspace, dt_0, solver_stats = None, t_0 = 0):
+    """
+    Advances u in place from t_0 to t_final with an embedded Runge-Kutta pair,
+    yielding the time after every accepted step (u then holds the solution there
+    and workspace.dt_next the step size the controller will try next)
+    
+    Each trial step is accepted only if its local error estimate is at most
+    err_target, otherwise it is retried with a smaller step (counted in
+    solver_stats.n_rejected if solver_stats is given). A non-finite error
+    estimate counts as a rejection, and the run stops with an exception once
+    the step size falls below the resolution of t (e.g. at a blow-up)
+    """
+    t = t_0
+    dt = dt_0
+    exponent = 1 / (workspace.order + 1)
+    
+    while t < t_final:
+        min_step = 10 * abs(np.nextafter(t, np.inf) - t)
+        if dt < min_step:
+            raise Exception("Step size fell below the minimum at t = " + str(t))
+        
+        dt = min(dt, t_final - t) #land exactly on t_final
+        err_current = workspace.attempt(f, t, u, dt)
+        
+        #Revise dt based on error, with a safety factor and limits on the change
+        if not np.isfinite(err_current):
+            factor = 0.2
+        elif err_current == 0:
+            factor = 5
+        else:
+            factor = min(5, max(0.2, 0.9 * (err_target / err_current) ** exponent))
+        
+        if not err_current <= err_target: #also rejects a NaN error
+            dt *= factor #reject the step and retry from the same point
+            if solver_stats is not None:
+                solver_stats.n_rejected += 1
+            continue
+        
+        workspace.accept(u)
+        t += dt
+        dt *= factor
+        workspace.dt_next = dt
+        yield t
+
+
+def integrate_adaptive(f, u_0, t_final, err_target, method = "dopri5", dt_0 = 0.01, dense_output = False,
+                       events = None, stats = False, step_hook = None, checkpoint = None, checkpoint_every = 60,
+                       dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final
+    without plotting anything
+    Allows for first order systems
+    
+    Uses an embedded Runge-Kutta pair: each trial step is accepted only if its
+    local error estimate is at most err_target, otherwise it is retried with a
+    smaller step. First-same-as-last pairs such as "dopri5" reuse the final
+    stage of an accepted step as the first stage of the next.
+    
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    method: name of a method in EMBEDDED_TABLEAUS ("dopri5", "bogacki_shampine")
+            or an embedded tableau (a, b, b_hat, c, order)
+    dt_0: first trial time step
+    dense_output: if True, also return a DenseOutput that evaluates the
+                  solution at any times in [0, t_final]
+    events: list of event functions g(t, u), see EventTracker
+    stats: if True, also return a SolverStats for the run
+    step_hook: function hook(t, u, dt) called after every accepted step, e.g. for
+               a profiler; u is the live state and must not be modified
+    checkpoint: path of a file to save the solver state in every checkpoint_every
+                seconds; if it exists the run resumes from it, and it is deleted
+                once the run completes (see Checkpoint)
+    checkpoint_every: wall time in seconds between checkpoints
+    dtype: type the solution is stored in, e.g. np.float32 to halve its memory
+    step_dtype: type the steps are computed in; np.float64 keeps the accuracy of
+                the method, np.float32 also steps in single precision (less
+                memory traffic for large ensembles, err_target must stay well above 1e-7 times the size of u)
+    
+    Returns
+    t_list: array of time points used, shape (n,)
+                (ends at the crossing if a terminal event fired)
+    u_list: array of solution at each time, shape (n,) or (n, d), of type dtype
+    sol: DenseOutput, only returned when dense_output is True
+    t_events: list of arrays of crossing times, only returned when events is given
+    u_events: list of arrays of solutions at the crossings, only returned when events is given
+    solver_stats: SolverStats, only returned when stats is True
+    """
+    #Setup variables
+    #----------------------------------
+    if checkpoint is not None:
+        key = tc.trajectory_key(integrate_adaptive, f, u_0, t_final, err_target, method, dt_0, dense_output, events,
+                                dtype = dtype, step_dtype = step_dtype)
+        checkpointer = Checkpoint(checkpoint, key, checkpoint_every)
+        state = checkpointer.load()
+    
+    dtype, step_dtype = _precision(dtype, step_dtype)
+    solver_stats = None
+    if stats:
+        solver_stats = SolverStats()
+        solver_stats.set_precision(dtype, step_dtype)
+        f = solver_stats.counted(f)
+    
+    u = _initial_state(u_0, step_dtype)
+    if err_target < 10 * np.finfo(step_dtype).eps * max(1, np.max(np.abs(u))):
+        raise Exception("err_target is below what " + step_dtype.name + " steps can resolve")
+    workspace = EmbeddedRKWorkspace(method, u)
+    
+    t_list = GrowableArray()
+    u_list = GrowableArray(u.shape, dtype = dtype)
+    du_list = GrowableArray(u.shape, dtype = dtype) #f(t, u) at each point, for the dense output
+    
+    t_list.append(0)
+    u_list.append(u)
+    if dense_output or events is not None:
+        du_list.append(workspace.derivative(f, 0, u))
+    
+    if events is not None:
+        tracker = EventTracker(events, 0, u)
+    
+    t_start = 0
+    if checkpoint is not None and state is not None: #continue the interrupted run
+        t_start = state["t"]
+        dt_0 = state["workspace"].dt_next
+        workspace = state["workspace"]
+        u[...] = state["u"]
+        t_list, u_list, du_list = _growable(state["t_list"]), _growable(state["u_list"]), _growable(state["du_list"])
+        if events is not None:
+            tracker.g_prev = state["g_prev"]
+            tracker.t_events = [state["t_events_" + str(j)] for j in range(len(events))]
+            tracker.u_events = [state["u_events_" + str(j)] for j in range(len(events))]
+        _restore_stats(solver_stats, state["stats"])
+    #----------------------------------
+    
+    #Integrate the IVP
+    #----------------------------------
+    if stats:
+        solver_stats.lap("time_storage")
+    t_previous = t_start
+    
+    for t in _adaptive_steps(f, u, t_final, err_target, workspace, dt_0, solver_stats, t_start):
+        if events is not None:
+            n = t_list.n - 1 #index of the start of the step
+            stop = tracker.check(t_list.data[n], u_list.data[n], du_list.data[n], t, u,
+                                 lambda: workspace.derivative(f, t, u))
+            if stop is not None: #end the solution at the terminal crossing
+                t_list.append(stop[0])
+                u_list.append(stop[1])
+                du_list.append(f(stop[0], stop[1]))
+                break
+        if dense_output or events is not None:
+            du = workspace.derivative(f, t, u)
+        if stats:
+            solver_stats.lap("time_step")
+        
+        t_list.append(t)
+        u_list.append(u)
+        if dense_output or events is not None:
+            du_list.append(du)
+        if stats:
+            solver_stats.lap("time_storage")
+        
+        if step_hook is not None:
+            step_hook(t, u, t - t_previous)
+            if stats: #the hook's own time is not counted
+                solver_stats.start()
+        t_previous = t
+        
+        if checkpoint is not None and checkpointer.due():
+            series = {"t_list": t_list.data[:t_list.n], "u_list": u_list.data[:u_list.n],
+                      "du_list": du_list.data[:du_list.n]}
+            if events is not None:
+                for j in range(len(events)):
+                    series["t_events_" + str(j)] = tracker.t_events[j]
+                    series["u_events_" + str(j)] = tracker.u_events[j]
+            checkpointer.save({"t": t, "u": u, "workspace": workspace, "stats": solver_stats,
+                               "g_prev": None if events is None else tracker.g_prev}, series)
+            if stats:
+                solver_stats.lap("time_storage")
+    #----------------------------------
+    
+    if checkpoint is not None:
+        checkpointer.remove()
+    t_list = t_list.trim()
+    u_list = u_list.trim()
+    
+    results = (t_list, u_list)
+    if dense_output:
+        results += (DenseOutput(t_list, u_list, du_list.trim()),)
+    if events is not None:
+        results += tracker.results()
+    if stats:
+        solver_stats.lap("time_storage")
+        solver_stats.record_steps(t_list)
+        results += (solver_stats,)
+    return results
+
+
+def stream_ivp(f, u_0, dt, t_final, method, chunk_size = 1024, t_eval = None, stride = 1, keep_last = False,
+               dtype = np.float64, step_dtype = np.float64):
     """
-    Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final
-    Allows for first-order systems
+    Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final,
+    yielding the solution in chunks as it integrates instead of storing it all
     
     Parameters
     f: function of t and u where f = du/dt
     u_0: initial value
     dt: time step
     t_final: final time
-    method: either "euler", "midpoint", "trapezoid", "classic_rk4", "equal_rk4"
-    plot_vars: list of variables to plot against time 
-               (for scalar equation, leave blank)
-    phase_vars: variables to plot in phase diagram (list of ordered pairs)
-                (for scalar equation, leave blank)
+    method: name of a method in TABLEAUS or MULTISTEP_METHODS, or a Butcher tableau (a, b, c)
+    chunk_size: number of output points per chunk
+    t_eval: increasing times in [0, t_final] at which to output the solution
+            (cubic Hermite interpolation between steps), or None
+    stride: when t_eval is None, output every stride-th step (and the last)
+    keep_last: if True, output only the solution at t_final
+    dtype: type of the output chunks, see integrate_ivp
+    step_dtype: type the steps are computed in, see integrate_ivp
     
-    Results
-    Plots the time series of chosen variables
-    Plots the 2D phase space of chosen variable pairs
+    Yields
+    t_chunk: array of output times
+    u_chunk: array of ordered tuples representing solution at those times, of type dtype
+    """
+    dtype, step_dtype = _precision(dtype, step_dtype)
+    n = int(t_final / dt)
+    step = t_final / n #spacing of the time points, as in integrate_ivp
+    u = _initial_state(u_0, step_dtype)
+    u_prev = np.empty_like(u)
     
-    Returns
-    u_list: array of ordered tuples representing solution at each time
+    workspace = make_workspace(method, u)
+    sampler = StreamSampler(u.shape, chunk_size, t_eval, stride, keep_last, dtype)
+    
+    for i in range(n):
+        np.copyto(u_prev, u)
+        workspace.step(f, i * step, u, dt)
+        yield from sampler.push(i * step, u_prev, workspace.start_derivative())
+    
+    du = f(t_final, u) if sampler.needs_derivative else None
+    yield from sampler.push(t_final, u, du, final = True) #the last time point is exactly t_final
+    yield from sampler.flush()
+
+
+def stream_adaptive(f, u_0, t_final, err_target, method = "dopri5", dt_0 = 0.01,
+                    chunk_size = 1024, t_eval = None, stride = 1, keep_last = False,
+                    dtype = np.float64, step_dtype = np.float64):
     """
+    Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final,
+    yielding the solution in chunks as it integrates instead of storing it all
     
-    #Setup variables
-    #----------------------------------
-    n = int(t_final / dt) #number of steps to take, total points is n + 1
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    method: embedded pair to use, see integrate_adaptive
+    dt_0: first trial time step
+    chunk_size: number of output points per chunk
+    t_eval: increasing times in [0, t_final] at which to output the solution
+            (cubic Hermite interpolation between steps), or None
+    stride: when t_eval is None, output every stride-th step (and the last)
+    keep_last: if True, output only the solution at t_final
+    dtype: type of the output chunks, see integrate_adaptive
+    step_dtype: type the steps are computed in, see integrate_adaptive
     
-    if isinstance(u_0, float):
-        u = u_0
-        u_list = np.empty( n + 1 )
-    elif isinstance(u_0, np.ndarray):
-        u = u_0.copy()
-        u_list = np.empty( (n + 1, len(u_0)) )
-    else:
-        raise Exception("Initial condition must be float or np.ndarray of floats")
+    Yields
+    t_chunk: array of output times
+    u_chunk: array of ordered tuples representing solution at those times, of type dtype
+    """
+    dtype, step_dtype = _precision(dtype, step_dtype)
+    u = _initial_state(u_0, step_dtype)
+    if err_target < 10 * np.finfo(step_dtype).eps * max(1, np.max(np.abs(u))):
+        raise Exception("err_target is below what " + step_dtype.name + " steps can resolve")
+    workspace = EmbeddedRKWorkspace(method, u)
+    sampler = StreamSampler(u.shape, chunk_size, t_eval, stride, keep_last, dtype)
     
-    t_list = np.linspace(0, t_final, n + 1)
-    u_list[0] = u_0
+    du = workspace.derivative(f, 0, u) if sampler.needs_derivative else None
+    yield from sampler.push(0, u, du)
     
-    #Integrate the IVP
+    for t in _adaptive_steps(f, u, t_final, err_target, workspace, dt_0):
+        du = workspace.derivative(f, t, u) if sampler.needs_derivative else None
+        yield from sampler.push(t, u, du, final = t >= t_final)
+    
+    yield from sampler.flush()
+
+
+def ensemble_ivp(f, u_0_list, dt, t_final, method, out_file = None, stats = False, step_hook = None,
+                 checkpoint = None, checkpoint_every = 60, dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final
+    for every u_0 in u_0_list at once, advancing the whole ensemble each step
+    
+    f is called with the batched state: for a system, u has shape (d, m)
+    so that u[k] is component k of every member, and f must return the same
+    shape. Right-hand sides written as np.array([... u[0] ... u[1] ...])
+    already work unchanged. For a scalar equation u has shape (m,).
+    
+    Parameters
+    f: function of t and batched u where f = du/dt
+    u_0_list: list of initial values (all floats or all np.ndarray of equal length)
+    dt: time step
+    t_final: final time
+    method: name of a method in TABLEAUS ("euler", "midpoint", "trapezoid", "ralston",
+            "classic_rk4", "equal_rk4", or registered with register_tableau),
+            a Butcher tableau (a, b, c), or a multistep method in MULTISTEP_METHODS
+            ("ab2" to "ab5", "abm2" to "abm5")
+    out_file: path of a .npy file to write the solution into as it is computed,
+              see _allocate_output
+    stats: if True, also return a SolverStats for the run (each batched call
+           of f and each step of the whole ensemble counts once)
+    step_hook: function hook(t, u, dt) called after every step with the batched state
+    checkpoint: path of a file to save the solver state in every checkpoint_every
+                seconds; if it exists the run resumes from it, and it is deleted
+                once the run completes (see Checkpoint). With out_file the
+                solution stays in out_file and only the state is saved.
+    checkpoint_every: wall time in seconds between checkpoints
+    dtype: type the solution is stored in, e.g. np.float32 to halve the memory of a large ensemble
+    step_dtype: type the steps are computed in, see integrate_ivp
+    
+    Returns
+    u_list: array of shape (m, n + 1) for scalar equations or (m, n + 1, d) for systems,
+            of type dtype, the same layout returned by compare_ivp (an np.memmap of out_file if given)
+    solver_stats: SolverStats, only returned when stats is True
+    """
+    #Setup variables
     #----------------------------------
-    if method == "euler":
-        for i in range(n):
-            u += f(t_list[i], u) * dt
-            u_list[i + 1] = u
+    state = None
+    if checkpoint is not None:
+        key = tc.trajectory_key(ensemble_ivp, f, u_0_list, dt, t_final, method,
+                                dtype = dtype, step_dtype = step_dtype)
+        checkpointer = Checkpoint(checkpoint, key, checkpoint_every)
+        state = checkpointer.load()
     
-    elif method == "midpoint":
-        for i in range(n):
-            k1 = f(t_list[i], u) * dt #step size from initial point
-            k2 = f(t_list[i] + dt/2, u + k1/2) * dt #step size from midpoint, estimate midpoint using initial point
-            u += k2
-            u_list[i + 1] = u
-            
-    elif method == "trapezoid":
-        for i in range(n):
-            k1 = f(t_list[i], u) * dt #step size from initial point
-            k2 = f(t_list[i] + dt, u + k1) * dt #step size from endpoint, estimate endpoint using initial point
-            u += k1/2 + k2/2
-            u_list[i + 1] = u
-            
-    elif method == "ralston":
-        for i in range(n):
-            k1 = f(t_list[i], u) * dt
-            k2 = f(t_list[i] + 2*dt/3, u + 2*k1/3) * dt
-            u += k1/4 + 3*k2/4
-            u_list[i + 1] = u
+    dtype, step_dtype = _precision(dtype, step_dtype)
+    solver_stats = None
+    if stats:
+        solver_stats = SolverStats()
+        solver_stats.set_precision(dtype, step_dtype)
+        f = solver_stats.counted(f)
     
-    elif method == "classic_rk4":
-        for i in range(n):
-            k1 = f(t_list[i], u) * dt #step size from initial point
-            k2 = f(t_list[i] + dt/2, u + k1/2) * dt #step size from midpoint, estimate midpoint using initial point
-            k3 = f(t_list[i] + dt/2, u + k2/2) * dt #step size from midpoint, estimate midpoint using midpoint
-            k4 = f(t_list[i] + dt, u + k3) * dt #step size from endpoint, estimate endpoint using midpoint
-            u += k1/6 + k2/3 + k3/3 + k4/6
-            u_list[i + 1] = u
-            
-    elif method == "equal_rk4":
-        for i in range(n):
-            k1 = f(t_list[i], u) * dt
-            k2 = f(t_list[i] + dt/3, u + k1/3) * dt
-            k3 = f(t_list[i] + 2*dt/3, u - k1/3 + k2) * dt
-            k4 = f(t_list[i] + dt, u + k1 - k2 + k3) * dt
-            u += k1/8 + 3*k2/8 + 3*k3/8 + k4/8
-            u_list[i + 1] = u
-            
+    n = int(t_final / dt)
+    t_list = np.linspace(0, t_final, n + 1)
+    resume = state is not None
+    
+    if isinstance(u_0_list[0], float):
+        u = np.array(u_0_list, dtype = step_dtype)
+        u_list = _allocate_output( (len(u_0_list), n + 1), out_file, resume, dtype )
+        u_view = u_list.T #u_view[i] is the ensemble at time step i
+    elif isinstance(u_0_list[0], np.ndarray):
+        u = np.array(u_0_list, dtype = step_dtype).T.copy() #shape (d, m)
+        u_list = _allocate_output( (len(u_0_list), n + 1, len(u_0_list[0])), out_file, resume, dtype )
+        u_view = u_list.transpose(1, 2, 0) #u_view[i] has shape (d, m)
     else:
-        raise Exception("Enter \"euler\", \"midpoint\", \"trapezoid\", \"ralston\", \"classic_rk4\" or \"equal_rk4\"")
-    #----------------------------------
-       
-    #Plot the solution
-    #----------------------------------
-    fig = plt.figure( figsize = (24,12) )
+        raise Exception("Initial conditions must be floats or np.ndarray of floats")
     
-    if isinstance(u_0, float): #can only plot solution x over time t
-        if plot_vars: #list is not empty, meaning we have a variable to plot
-            axes = fig.subplots(1,1)
-            axes.plot(t_list, u_list)
-            axes.set_title("Time series for x")
-            axes.set_xlabel("t")
-            axes.set_ylabel("x")
+    u_view[0] = u
+    i_start = 0
+    workspace = None
+    if resume: #continue the interrupted run
+        i_start = state["i"]
+        workspace = state["workspace"]
+        u[...] = state["u"]
+        if out_file is None:
+            u_view[:len(state["u_view"])] = state["u_view"]
+        _restore_stats(solver_stats, state["stats"])
     
-    elif isinstance(u_0, np.ndarray):
-        if plot_vars or phase_vars:
-            axes = fig.subplots(2, max(len(plot_vars), len(phase_vars)))
-            for i, var in enumerate(plot_vars):
-                axes[0, i].plot(t_list, u_list[:,var])
-                axes[0, i].set_title("Time series for x" + str(var))
-                axes[0, i].set_xlabel("t")
-                axes[0, i].set_ylabel("x" + str(var))
-                
-            for i, var in enumerate(phase_vars):
-                axes[1, i].plot(u_list[:,var[0]], u_list[:,var[1]])
-                axes[1, i].set_xlabel("x" + str(var[0]))
-                axes[1, i].set_ylabel("y" + str(var[1]))
-                axes[1, i].set_title("Phase diagram for x" + str(var[0]) + " and x" + str(var[1]))
+    save = None
+    if checkpoint is not None:
+        def save(i, workspace):
+            if checkpointer.due():
+                _finish_output(u_list) #the rows up to i are on disk before the state that needs them
+                checkpointer.save({"i": i, "u": u, "workspace": workspace, "stats": solver_stats},
+                                  None if out_file is not None else {"u_view": u_view[:i + 1]})
+    if stats:
+        solver_stats.lap("time_storage")
     #----------------------------------
     
-    #Return the solution
+    #Integrate all members together
     #----------------------------------
-    return u_list
+    _fixed_step_loop(f, u, t_list, dt, method, u_view, solver_stats, step_hook, i_start, workspace, save)
+    _finish_output(u_list)
+    if checkpoint is not None:
+        checkpointer.remove()
     #----------------------------------
+    
+    if stats:
+        solver_stats.lap("time_storage")
+        solver_stats.record_steps(t_list)
+        return u_list, solver_stats
+    return u_list
+
+
+def integrate_compare(f, u_0_list, dt, t_final, method, vectorized = False, out_file = None, stats = False,
+                      checkpoint = None, checkpoint_every = 60, dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final
+    for multiple different initial values u_0, without plotting anything
+    
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0_list: list of initial values
+    dt: time step
+    t_final: final time
+    method: name of a method in TABLEAUS ("euler", "midpoint", "trapezoid", "ralston",
+            "classic_rk4", "equal_rk4", or registered with register_tableau),
+            a Butcher tableau (a, b, c), or a multistep method in MULTISTEP_METHODS
+            ("ab2" to "ab5", "abm2" to "abm5")
+    vectorized: if True, f accepts batched states and all initial values are
+                stepped together (see ensemble_ivp)
+    out_file: path of a .npy file to write the solution into as it is computed,
+              see _allocate_output
+    stats: if True, also return a SolverStats totalled over every initial condition
+    checkpoint: path of a file to save the solver state in every checkpoint_every
+                seconds; if it exists the run resumes from it, and it is deleted
+                once the run completes (see Checkpoint). With out_file the
+                solution stays in out_file and only the state is saved.
+    checkpoint_every: wall time in seconds between checkpoints
+    dtype: type the solution is stored in, e.g. np.float32 to halve the memory of a large ensemble
+    step_dtype: type the steps are computed in, see integrate_ivp
+    
+    Returns
+    t_list: array of time points, shared by every initial condition
+    u_list: array of ordered tuples representing solution for each initial condition,
+            of type dtype, an np.memmap of out_file if it is given
+    solver_stats: SolverStats, only returned when stats is True
+    """
+    n = int(t_final / dt)
+    t_list = np.linspace(0, t_final, n + 1)
+    
+    if vectorized:
+        return (t_list,) + _as_tuple(ensemble_ivp(f, u_0_list, dt, t_final, method, out_file, stats, None,
+                                                  checkpoint, checkpoint_every, dtype, step_dtype))
+    
+    state = None
+    if checkpoint is not None:
+        key = tc.trajectory_key(integrate_compare, f, u_0_list, dt, t_final, method,
+                                dtype = dtype, step_dtype = step_dtype)
+        checkpointer = Checkpoint(checkpoint, key, checkpoint_every)
+        state = checkpointer.load()
+    
+    dtype, step_dtype = _precision(dtype, step_dtype)
+    solver_stats = None
+    if stats:
+        solver_stats = SolverStats()
+        solver_stats.set_precision(dtype, step_dtype)
+        f = solver_stats.counted(f)
+    
+    resume = state is not None
+    if isinstance(u_0_list[0], float):
+        u_list = _allocate_output( (len(u_0_list), n + 1), out_file, resume, dtype )
+    elif isinstance(u_0_list[0], np.ndarray):
+        u_list = _allocate_output( (len(u_0_list), n + 1, len(u_0_list[0])), out_file, resume, dtype )
+    else:
+        raise Exception("Initial conditions must be floats or np.ndarray of floats")
+    
+    u_flat = u_list.reshape( (-1,) + u_list.shape[2:] ) #the members one after another, to checkpoint as one series
+    member_start = 0
+    if resume: #continue the interrupted run from the member it stopped in
+        member_start = state["member"]
+        if out_file is None:
+            u_flat[:len(state["u_flat"])] = state["u_flat"]
+        _restore_stats(solver_stats, state["stats"])
+    if stats:
+        solver_stats.lap("time_storage")
+    
+    #Each member is written straight into its row, with no temporary copy
+    for j in range(member_start, len(u_0_list)):
+        u = _initial_state(u_0_list[j], step_dtype)
+        u_list[j, 0] = u
+        i_start = 0
+        workspace = None
+        if resume and j == member_start:
+            i_start = state["i"]
+            workspace = state["workspace"]
+            u[...] = state["u"]
+        
+        save = None
+        if checkpoint is not None:
+            def save(i, workspace, j = j, u = u):
+                if checkpointer.due():
+                    _finish_output(u_list) #the rows up to i are on disk before the state that needs them
+                    checkpointer.save({"member": j, "i": i, "u": u, "workspace": workspace, "stats": solver_stats},
+                                      None if out_file is not None else {"u_flat": u_flat[:j * (n + 1) + i + 1]})
+        
+        _fixed_step_loop(f, u, t_list, dt, method, u_list[j], solver_stats, None, i_start, workspace, save)
+        if stats:
+            solver_stats.record_steps(t_list)
+    _finish_output(u_list)
+    if checkpoint is not None:
+        checkpointer.remove()
+    
+    if stats:
+        solver_stats.lap("time_storage")
+        return t_list, u_list, solver_stats
+    return t_list, u_list
 
 
-def adaptive_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars):
+def integrate_compare_adaptive(f, u_0_list, t_final, err_target, method = "dopri5", stats = False,
+                               dtype = np.float64, step_dtype = np.float64):
     """
     Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final
-    Allows for first order systems
+    for multiple different initial values, without plotting anything
     
     Parameters
     f: function of t and u where f = du/dt
-    u_0: initial value
+    u_0_list: list of initial values
     t_final: final time
     err_target: target step error
+    method: embedded pair to use, see integrate_adaptive
+    stats: if True, also return a SolverStats totalled over every initial condition
+    dtype: type the solution is stored in, see integrate_adaptive
+    step_dtype: type the steps are computed in, see integrate_adaptive
+    
+    Returns
+    t_list: list of time point arrays, one per initial condition
+    u_list: list of solution arrays, one per initial condition
+    solver_stats: SolverStats, only returned when stats is True
+    """
+    t_list = [] #first index selects initial condition, second index selects time value
+    u_list = [] #first index selects initial condition, second index selects solution at specified time
+    solver_stats = None
+    if stats:
+        solver_stats = SolverStats()
+        solver_stats.set_precision(dtype, step_dtype)
+    
+    for u_0 in u_0_list:
+        results = integrate_adaptive(f, u_0, t_final, err_target, method, stats = stats,
+                                     dtype = dtype, step_dtype = step_dtype)
+        t_list.append(results[0])
+        u_list.append(results[1])
+        if stats:
+            solver_stats.merge(results[2])
+    
+    if stats:
+        return t_list, u_list, solver_stats
+    return t_list, u_list
+
+
+def _as_tuple(results):
+    """
+    Wraps a single returned array in a tuple, leaving tuples of results alone
+    """
+    return results if isinstance(results, tuple) else (results,)
+
+
+def _timed_plot(solver_stats, plot, *args):
+    """
+    Calls plot(*args), adding its wall time to solver_stats.time_plot unless solver_stats is None
+    """
+    if solver_stats is not None:
+        solver_stats.start()
+    plot(*args)
+    if solver_stats is not None:
+        solver_stats.lap("time_plot")
+
+
+def decimate(buckets, *columns):
+    """
+    Picks the points of a long time series that are worth drawing, so the
+    cost of plotting depends on the resolution rather than the number of samples
+    
+    The samples are split into buckets of consecutive points; each bucket
+    keeps its first and last point and the points where every column takes
+    its minimum and maximum (the M4 scheme). With one bucket per pixel column
+    the drawn line covers the same pixels as the full one.
+    
+    Parameters
+    buckets: number of buckets, 0 (or at least a quarter of the samples) keeps every point
+    columns: arrays of equal length to keep the extremes of
+    
+    Returns
+    indices: increasing indices of the points to draw (a slice of all points
+             if nothing is dropped)
+    """
+    n = len(columns[0])
+    if buckets <= 0 or n <= 4 * buckets:
+        return slice(None)
+    
+    size = -(-n // buckets) #samples per bucket
+    n_buckets = -(-n // size)
+    starts = np.arange(n_buckets) * size
+    keep = [starts, np.minimum(starts + size - 1, n - 1)]
+    
+    for column in columns:
+        #Pad the last bucket with the final value, whose index clips back to n - 1
+        padded = np.empty(n_buckets * size, dtype = np.result_type(column, np.float32))
+        padded[:n] = column
+        padded[n:] = column[-1]
+        padded = padded.reshape(n_buckets, size)
+        keep.append(np.minimum(starts + np.argmin(padded, axis = 1), n - 1))
+        keep.append(np.minimum(starts + np.argmax(padded, axis = 1), n - 1))
+    
+    return np.unique(np.concatenate(keep))
+
+
+def thin_curve(x, y, cells_x, cells_y):
+    """
+    Picks the points of a long phase curve that are worth drawing: the range
+    of the curve is divided into cells_x by cells_y cells (one per pixel) and
+    only the points where the curve enters a new cell are kept, with the
+    first and last, so the drawn curve is within a cell of the full one
+    
+    Parameters
+    x, y: coordinates of the curve
+    cells_x, cells_y: number of cells across each axis, 0 keeps every point
+    
+    Returns
+    indices: increasing indices of the points to draw (a slice of all points
+             if thinning is off)
+    """
+    if cells_x <= 0 or cells_y <= 0 or len(x) <= 2:
+        return slice(None)
+    
+    moved = np.zeros(len(x), dtype = bool)
+    for values, cells in [(x, cells_x), (y, cells_y)]:
+        width = np.ptp(values) / cells
+        cell = np.floor( (values - np.min(values)) / (width if width > 0 else 1) )
+        moved[1:] |= cell[1:] != cell[:-1]
+    moved[0] = moved[-1] = True
+    return np.nonzero(moved)[0]
+
+
+def _pixels(resolution, ax):
+    """
+    Resolution to decimate a curve drawn in ax to: (resolution, resolution) if
+    given, otherwise the size of ax in pixels
+    """
+    if resolution is not None:
+        return resolution, resolution
+    extent = ax.get_window_extent()
+    return max(1, int(extent.width)), max(1, int(extent.height))
+
+
+def plot_solution(t_list, u_list, plot_vars, phase_vars, axes = None, resolution = None):
+    """
+    Plots the time series and phase diagrams of a single solution
+    Long solutions are decimated before drawing (see decimate and thin_curve),
+    so plotting time depends on the size of the figure rather than the number
+    of points
+    
+    Parameters
+    t_list: time points
+    u_list: solution at each time point (floats or ordered tuples)
+    plot_vars: variables to plot against time 
+               (for scalar equation, any non-empty list plots x)
+    phase_vars: variables to plot in phase diagram (list of ordered pairs)
+    axes: 2-D array of axes to draw into, a new figure is made if None
+    resolution: number of pixels across each subplot to decimate to; None uses
+                the actual size of each subplot, 0 draws every point
+    
+    Returns
+    axes: 2-D array of axes drawn into, or None if nothing was requested
+    """
+    import matplotlib.pyplot as plt #only loaded when plotting, so headless runs and workers skip it
+    
+    t_list = np.asarray(t_list)
+    u_list = np.asarray(u_list)
+    
+    if u_list.ndim == 1: #can only plot solution x over time t
+        if not plot_vars:
+            return None
+        if axes is None:
+            fig = plt.figure( figsize = (24,12) )
+            axes = fig.subplots(1, 1, squeeze = False)
+        keep = decimate(_pixels(resolution, axes[0, 0])[0], u_list)
+        axes[0, 0].plot(t_list[keep], u_list[keep])
+        axes[0, 0].set_title("Time series for x")
+        axes[0, 0].set_xlabel("t")
+        axes[0, 0].set_ylabel("x")
+        return axes
+    
+    if not (plot_vars or phase_vars):
+        return None
+    if axes is None:
+        fig = plt.figure( figsize = (24,12) )
+        axes = fig.subplots(2, max(len(plot_vars), len(phase_vars)), squeeze = False)
+    
+    for i, var in enumerate(plot_vars):
+        keep = decimate(_pixels(resolution, axes[0, i])[0], u_list[:,var])
+        axes[0, i].plot(t_list[keep], u_list[keep, var])
+        axes[0, i].set_title("Time series for x" + str(var))
+        axes[0, i].set_xlabel("t")
+        axes[0, i].set_ylabel("x" + str(var))
+        
+    for i, var in enumerate(phase_vars):
+        keep = thin_curve(u_list[:,var[0]], u_list[:,var[1]], *_pixels(resolution, axes[1, i]))
+        axes[1, i].plot(u_list[keep, var[0]], u_list[keep, var[1]])
+        axes[1, i].set_xlabel("x" + str(var[0]))
+        axes[1, i].set_ylabel("y" + str(var[1]))
+        axes[1, i].set_title("Phase diagram for x" + str(var[0]) + " and x" + str(var[1]))
+    
+    return axes
+
+
+def plot_compare(t_list, u_list, plot_vars, phase_vars, resolution = None):
+    """
+    Plots the solutions for several initial conditions on shared axes
+    
+    Parameters
+    t_list: either one array of time points shared by every solution,
+            or a list with one array of time points per solution
+    u_list: list (or array) of solutions, one per initial condition
     plot_vars: variables to plot against time
     phase_vars: variables to plot in phase diagram (list of ordered pairs)
+    resolution: pixels to decimate each curve to, see plot_solution
+    
+    Returns
+    axes: 2-D array of axes drawn into, or None if nothing was requested
+    """
+    shared_t = isinstance(t_list, np.ndarray) and t_list.ndim == 1
+    axes = None
+    
+    for i in range(len(u_list)):
+        cur_t_list = t_list if shared_t else t_list[i]
+        axes = plot_solution(cur_t_list, u_list[i], plot_vars, phase_vars, axes, resolution)
+        if axes is None:
+            return None
+    
+    return axes
+
+
+def solve_ivp(f, u_0, dt, t_final, method, plot_vars, phase_vars, events = None, out_file = None,
+              stats = False, step_hook = None, dtype = np.float64, step_dtype = np.float64, resolution = None):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final
+    Allows for first-order systems
+    
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    dt: time step
+    t_final: final time
+    method: name of a method in TABLEAUS ("euler", "midpoint", "trapezoid", "ralston",
+            "classic_rk4", "equal_rk4", or registered with register_tableau),
+            a Butcher tableau (a, b, c), or a multistep method in MULTISTEP_METHODS
+            ("ab2" to "ab5", "abm2" to "abm5")
+    plot_vars: list of variables to plot against time 
+               (for scalar equation, leave blank)
+    phase_vars: variables to plot in phase diagram (list of ordered pairs)
+                (for scalar equation, leave blank)
+    events: list of event functions g(t, u), see EventTracker
+    out_file: path of a .npy file to write the solution into, see integrate_ivp
+    stats: if True, also return a SolverStats including the plotting time
+    step_hook: function hook(t, u, dt) called after every step, see integrate_ivp
+    dtype: type the solution is stored in, see integrate_ivp
+    step_dtype: type the steps are computed in, see integrate_ivp
+    resolution: pixels to decimate each curve to before plotting, see plot_solution
     
     Results
     Plots the time series of chosen variables
     Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty, see integrate_ivp
     
     Returns
-    t_list: list of time points used
-    u_list: list of ordered tuples representing solution at each time
+    u_list: array of ordered tuples representing solution at each time
+    When events is given, returns t_list, u_list, t_events, u_events instead
+    (see integrate_ivp), since a terminal event can end the solution early
+    solver_stats: SolverStats, returned last when stats is True
     """
-    #Setup variables
-    #----------------------------------
-    if isinstance(u_0, float):
-        u = u_0
-    elif isinstance(u_0, np.ndarray):
-        u = u_0.copy()
-        
-    t = 0
-    u_list = []
-    t_list = []
-    u_list.append(u_0)
-    t_list.append(0)
-    dt_trial = 0.01
-    #----------------------------------
+    results = integrate_ivp(f, u_0, dt, t_final, method, events, out_file, stats, step_hook, dtype, step_dtype)
+    solver_stats = results[-1] if stats else None
+    _timed_plot(solver_stats, plot_solution, results[0], results[1], plot_vars, phase_vars, None, resolution)
     
-    #Integrate the IVP
-    #----------------------------------
-    while(t < t_final):
-        #First, attempt a step using a dt_trial
-        
-        #Use midpoint method for dt^3 step error
-        k1 = f(t, u) * dt_trial #step size from initial point
-        k2 = f(t + dt_trial/2, u + k1/2) * dt_trial #step size from midpoint, estimate midpoint using initial point
-        u_rk2 = u + k2
-        
-        #Use equal_rk4 method for dt^5 step error
-        k1 = f(t, u) * dt_trial
-        k2 = f(t + dt_trial/3, u + k1/3) * dt_trial
-        k3 = f(t + 2*dt_trial/3, u - k1/3 + k2) * dt_trial
-        k4 = f(t + dt_trial, u + k1 - k2 + k3) * dt_trial
-        u_rk4 = u + k1/8 + 3*k2/8 + 3*k3/8 + k4/8
-        
-        err_current = np.linalg.norm(u_rk4 - u_rk2)
-        
-        #Revise dt based on error
-        dt = dt_trial * (err_target / err_current) ** (1/3)
-        
-        #Now, make step using the adaptive dt
-        k1 = f(t, u) * dt
-        k2 = f(t + dt/3, u + k1/3) * dt
-        k3 = f(t + 2*dt/3, u - k1/3 + k2) * dt
-        k4 = f(t + dt, u + k1 - k2 + k3) * dt
-        u += k1/8 + 3*k2/8 + 3*k3/8 + k4/8
-        
-        if isinstance(u_0, float):
-            u_list.append(u)
-        elif isinstance(u_0, np.ndarray):
-            u_list.append(u.copy())
-        
-        t += dt
-        t_list.append(t)
-        
-        dt_trial = dt
-    #----------------------------------
+    if events is not None:
+        return results
+    if stats:
+        return results[1], solver_stats
+    return results[1]
 
-    #Plot the solution
-    #----------------------------------
-    fig = plt.figure( figsize = (24,12) )
+
+def adaptive_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars, method = "dopri5", events = None,
+                 stats = False, step_hook = None, checkpoint = None, checkpoint_every = 60,
+                 dtype = np.float64, step_dtype = np.float64, resolution = None):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final
+    Allows for first order systems
     
-    if isinstance(u_0, float):
-        if plot_vars: #list is not empty, meaning we have a variable to plot
-            fig = plt.figure( figsize = (24,12) )
-            axes = fig.subplots(1,1)
-            axes.plot(t_list, u_list)
-            axes.set_title("Time series for x")
-            axes.set_xlabel("t")
-            axes.set_ylabel("x")
-            
-    elif isinstance(u_0, np.ndarray):
-        if plot_vars or phase_vars:
-            axes = fig.subplots(2, max(len(plot_vars), len(phase_vars)))
-            for i, var in enumerate(plot_vars):
-                axes[0, i].plot(t_list, [u[var] for u in u_list])
-                axes[0, i].set_title("Time series for x" + str(var))
-                axes[0, i].set_xlabel("t")
-                axes[0, i].set_ylabel("x" + str(var))
-                
-            for i, var in enumerate(phase_vars):
-                axes[1, i].plot([u[var[0]] for u in u_list], [u[var[1]] for u in u_list])
-                axes[1, i].set_xlabel("x" + str(var[0]))
-                axes[1, i].set_ylabel("y" + str(var[1]))
-                axes[1, i].set_title("Phase diagram for x" + str(var[0]) + " and x" + str(var[1]))
-    #----------------------------------
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    plot_vars: variables to plot against time
+    phase_vars: variables to plot in phase diagram (list of ordered pairs)
+    method: embedded pair to use, see integrate_adaptive
+    events: list of event functions g(t, u), see EventTracker
+    stats: if True, also return a SolverStats including the plotting time
+    step_hook: function hook(t, u, dt) called after every accepted step, see integrate_adaptive
+    checkpoint: path of a file to save the solver state in, to resume an
+                interrupted run, see integrate_adaptive
+    checkpoint_every: wall time in seconds between checkpoints
+    dtype: type the solution is stored in, see integrate_adaptive
+    step_dtype: type the steps are computed in, see integrate_adaptive
+    resolution: pixels to decimate each curve to before plotting, see plot_solution
     
-    #Return the solution
-    #----------------------------------
-    return t_list, u_list
-    #----------------------------------
+    Results
+    Plots the time series of chosen variables
+    Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty, see integrate_adaptive
+    
+    Returns
+    t_list: array of time points used
+    u_list: array of ordered tuples representing solution at each time
+    t_events, u_events: crossings of each event, only returned when events is given
+    solver_stats: SolverStats, only returned when stats is True
+    """
+    results = integrate_adaptive(f, u_0, t_final, err_target, method, events = events, stats = stats,
+                                 step_hook = step_hook, checkpoint = checkpoint, checkpoint_every = checkpoint_every,
+                                 dtype = dtype, step_dtype = step_dtype)
+    _timed_plot(results[-1] if stats else None, plot_solution, results[0], results[1], plot_vars, phase_vars,
+                None, resolution)
+    
+    return results
 
 
-def compare_ivp(f, u_0_list, dt, t_final, method, plot_vars, phase_vars):
+def compare_ivp(f, u_0_list, dt, t_final, method, plot_vars, phase_vars, vectorized = False, out_file = None,
+                stats = False, checkpoint = None, checkpoint_every = 60, dtype = np.float64, step_dtype = np.float64,
+                resolution = None):
     """
     Solves du/dt = f(t,u), u(0) = u_0 with step size dt until time t_final
     for multiple different initial values u_0, and plots solution for all u_0
@@ -250,58 +2053,44 @@ def compare_ivp(f, u_0_list, dt, t_final, method, plot_vars, phase_vars):
     u_0_list: list of initial values
     dt: time step
     t_final: final time
-    method: either "euler", "midpoint", "trapezoid", "classic_rk4", "equal_rk4"
+    method: name of a method in TABLEAUS ("euler", "midpoint", "trapezoid", "ralston",
+            "classic_rk4", "equal_rk4", or registered with register_tableau),
+            a Butcher tableau (a, b, c), or a multistep method in MULTISTEP_METHODS
+            ("ab2" to "ab5", "abm2" to "abm5")
     plot_vars: variables to plot against time
     phase_vars: variables to plot in phase diagram (list of ordered pairs)
+    vectorized: if True, f accepts batched states and all initial values are
+                stepped together (see ensemble_ivp)
+    out_file: path of a .npy file to write the solution into, see integrate_compare
+    stats: if True, also return a SolverStats including the plotting time
+    checkpoint: path of a file to save the solver state in, to resume an
+                interrupted run, see integrate_compare
+    checkpoint_every: wall time in seconds between checkpoints
+    dtype: type the solution is stored in, e.g. np.float32 to halve the memory of large ensembles
+    step_dtype: type the steps are computed in, see integrate_compare
+    resolution: pixels to decimate each curve to before plotting, see plot_solution
     
     Results
     Plots the time series of chosen variables
     Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty, see integrate_compare
     
     Returns
     u_list: array of ordered tuples representing solution for each initial condition
+    solver_stats: SolverStats, only returned when stats is True
     """
+    results = integrate_compare(f, u_0_list, dt, t_final, method, vectorized, out_file, stats,
+                                checkpoint, checkpoint_every, dtype, step_dtype)
+    solver_stats = results[-1] if stats else None
+    _timed_plot(solver_stats, plot_compare, results[0], results[1], plot_vars, phase_vars, resolution)
     
-    n = int(t_final / dt)
-    fig = plt.figure( figsize = (24,12) )
-    t_list = np.linspace(0, t_final, n + 1)
-    
-    if isinstance(u_0_list[0], float):
-        u_list = np.empty( (len(u_0_list), n+1) )
-        axes = fig.subplots(1, 1)
-        
-        for i, u_0 in enumerate(u_0_list):
-            u_list[i] = solve_ivp(f, u_0, dt, t_final, method, [], [])
-
-            axes.plot(t_list, u_list[i,:])
-            axes.set_title("Time series for x")
-            axes.set_xlabel("t")
-            axes.set_ylabel("x")
-    
-    elif isinstance(u_0_list[0], np.ndarray):
-        u_list = np.empty( (len(u_0_list), n + 1, len(u_0_list[0])) )
-        axes = fig.subplots(2, max(len(plot_vars), len(phase_vars)))
-        
-        for i, u_0 in enumerate(u_0_list):
-            u_list[i] = solve_ivp(f, u_0, dt, t_final, method, [], [])
-            
-            for j, var in enumerate(plot_vars):
-                axes[0, j].plot(t_list, u_list[i,:,var])
-                axes[0, j].set_title("Time series for x" + str(var))
-                axes[0, j].set_xlabel("t")
-                axes[0, j].set_ylabel("x" + str(var))
-        
-            for j, var in enumerate(phase_vars):
-                axes[1, j].plot(u_list[i,:,var[0]], u_list[i,:,var[1]])
-                axes[1, j].set_xlabel("x" + str(var[0]))
-                axes[1, j].set_ylabel("y" + str(var[1]))
-                axes[1, j].set_title("Phase diagram for x" + str(var[0]) + " and x" + str(var[1]))
-            
-    return u_list
-    #----------------------------------
+    if stats:
+        return results[1], solver_stats
+    return results[1]
 
 
-def compare_adaptive(f, u_0_list, t_final, err_target, plot_vars, phase_vars):
+def compare_adaptive(f, u_0_list, t_final, err_target, plot_vars, phase_vars, method = "dopri5", stats = False,
+                     dtype = np.float64, step_dtype = np.float64, resolution = None):
     """
     Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final
     for multiple different initial values, plots solution for all u_0
@@ -313,50 +2102,24 @@ def compare_adaptive(f, u_0_list, t_final, err_target, plot_vars, phase_vars):
     err_target: target step error
     plot_vars: variables to plot against time
     phase_vars: variables to plot in phase diagram (list of ordered pairs)
+    method: embedded pair to use, see integrate_adaptive
+    stats: if True, also return a SolverStats including the plotting time
+    dtype: type the solutions are stored in, see integrate_adaptive
+    step_dtype: type the steps are computed in, see integrate_adaptive
+    resolution: pixels to decimate each curve to before plotting, see plot_solution
     
     Results
     Plots the time series of chosen variables
     Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty, see integrate_compare_adaptive
     
     Returns
-    t_list: array of time points used
-    u_list: array of ordered tuples representing solution for each initial condition
+    t_list: list of time point arrays, one per initial condition
+    u_list: list of solution arrays, one per initial condition
+    solver_stats: SolverStats, only returned when stats is True
     """
-    t_list = [] #2-D array, first index selects initial condition, second index selects time value
-    u_list = [] #2-D array (scalar ODE), first index selects initial condition, second index selects solution value at specified time
-                #3-D array (system ODE), first index selects initial condition, second index selects solution vector at specified time, third index selects solution component
-    fig = plt.figure( figsize = (24,12) )
-    
-    if isinstance(u_0_list[0], float):
-        axes = fig.subplots(1, 1)
-        
-        for u_0 in u_0_list:
-            cur_t_list, cur_u_list = adaptive_ivp(f, u_0, t_final, err_target, [], [])
-            u_list.append(cur_u_list)
-
-            axes.plot(cur_t_list, cur_u_list)
-            axes.set_title("Time series for x")
-            axes.set_xlabel("t")
-            axes.set_ylabel("x")
+    results = integrate_compare_adaptive(f, u_0_list, t_final, err_target, method, stats, dtype, step_dtype)
+    _timed_plot(results[-1] if stats else None, plot_compare, results[0], results[1], plot_vars, phase_vars,
+                resolution)
     
-    elif isinstance(u_0_list[0], np.ndarray):
-        axes = fig.subplots(2, max(len(plot_vars), len(phase_vars)))
-        
-        for u_0 in u_0_list:
-            cur_t_list, cur_u_list = adaptive_ivp(f, u_0, t_final, err_target, [], [])
-            
-            for j, var in enumerate(plot_vars):
-                axes[0, j].plot(cur_t_list, [u[var] for u in cur_u_list])
-                axes[0, j].set_title("Time series for x" + str(var))
-                axes[0, j].set_xlabel("t")
-                axes[0, j].set_ylabel("x" + str(var))
-        
-            for j, var in enumerate(phase_vars):
-                axes[1, j].plot([u[var[0]] for u in cur_u_list], [u[var[1]] for u in cur_u_list])
-                axes[1, j].set_xlabel("x" + str(var[0]))
-                axes[1, j].set_ylabel("y" + str(var[1]))
-                axes[1, j].set_title("Phase diagram for x" + str(var[0]) + " and x" + str(var[1]))
-                
-    return t_list, u_list
-    #----------------------------------
-    
\ No newline at end of file
+    return results
@@ -3,6 +3,7 @@ Solves, then animates solution to the Lorenz oscillator.
 """
 
 import Initial_Value_Problems as ivp
+import Trajectory_Cache as tc
 import manim as mn
 import numpy as np
 import math
@@ -25,10 +26,10 @@ class LorenzOscillatorTime(mn.Scene):
 
         
         #Run the algorithm, but don't plot, just return solution
-        u_list = ivp.solve_ivp(f, u_0, dt, t_final, method, [], [])
-        x_list = [u[0] for u in u_list]
-        y_list = [u[1] for u in u_list]
-        z_list = [u[2] for u in u_list]
+        t_list, u_list = tc.cached(ivp.integrate_ivp, f, u_0, dt, t_final, method)
+        x_list = u_list[:, 0]
+        y_list = u_list[:, 1]
+        z_list = u_list[:, 2]
         #------------------------------
         
         
@@ -166,10 +167,10 @@ class LorenzOscillatorPhase(mn.Scene):
 
 
         #Run the algorithm, but don't plot, just return solution
-        u_list = ivp.solve_ivp(f, u_0, dt, t_final, method, [], [])
-        x_list = [u[0] for u in u_list]
-        y_list = [u[1] for u in u_list]
-        z_list = [u[2] for u in u_list]
+        t_list, u_list = tc.cached(ivp.integrate_ivp, f, u_0, dt, t_final, method)
+        x_list = u_list[:, 0]
+        y_list = u_list[:, 1]
+        z_list = u_list[:, 2]
         #------------------------------
         
         
@@ -346,10 +347,10 @@ class LorenzOscillatorAnim(mn.Scene):
 
 
         #Run the algorithm, but don't plot, just return solution
-        u_list = ivp.solve_ivp(f, u_0, dt, t_final, method, [], [])
-        x_list = [u[0] for u in u_list]
-        y_list = [u[1] for u in u_list]
-        z_list = [u[2] for u in u_list]
+        t_list, u_list = tc.cached(ivp.integrate_ivp, f, u_0, dt, t_final, method)
+        x_list = u_list[:, 0]
+        y_list = u_list[:, 1]
+        z_list = u_list[:, 2]
         #------------------------------
         
         
@@ -573,10 +574,10 @@ class LorenzOscillatorAdaptiveTime(mn.Scene):
 
         
         #Run the algorithm, but don't plot, just return solution
-        t_list, u_list = ivp.adaptive_ivp(f, u_0, t_final, err_target, [], [])
-        x_list = [u[0] for u in u_list]
-        y_list = [u[1] for u in u_list]
-        z_list = [u[2] for u in u_list]
+        t_list, u_list, sol = tc.cached(ivp.integrate_adaptive, f, u_0, t_final, err_target, dense_output = True)
+        x_list = u_list[:, 0]
+        y_list = u_list[:, 1]
+        z_list = u_list[:, 2]
         #------------------------------
         
         
@@ -623,69 +624,25 @@ class LorenzOscillatorAdaptiveTime(mn.Scene):
         
         
         #Add functions to plot
-        def largest_leq_than(t):
-            """
-            Finds the largest time value in t_list less than or equal to input t,
-            which allows us to determine which interval t is in
-            """
-            n = len(t_list)
-            
-            lower_index = 0 
-            #lower bound starts at t_list[0] which is t = 0
-            upper_index = n - 1 
-            #upper bound starts at t_list[n - 1] which is t = t_final
-            
-            #Catch t not within time range, should not happen in normal use
-            if t < t_list[0] or t > t_list[n - 1]:
-                raise Exception("t not within time range")
-            
-            #Binary search for the interval that t is in
-            while upper_index - lower_index > 1:
-                mid_index = math.floor( (lower_index + upper_index) / 2 )
-                if t == t_list[mid_index]:
-                    lower_index = mid_index
-                    upper_index = mid_index + 1
-                elif t < t_list[mid_index]:
-                    upper_index = mid_index
-                elif t > t_list[mid_index]:
-                    lower_index = mid_index
-                    
-            return lower_index 
-            #t is between t_list[lower_index] (inclusive) and t_list[lower_index + 1] exclusive
-            #except for input t = t_final
-            
-            
         def x(t):
             """
-            Solution to x interpolated from list of points.
+            Solution to x evaluated from the dense output interpolant.
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (x_list[i + 1] - x_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + x_list[i]
-            #linear interpolating function, in point-slope form
-        
-        
+            return sol(t)[0]
+
+
         def y(t):
             """
-            Solution to y interpolated from list of points.
+            Solution to y evaluated from the dense output interpolant.
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (y_list[i + 1] - y_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + y_list[i]
-            #linear interpolating function, in point-slope form
+            return sol(t)[1]
 
 
         def z(t):
             """
-            Solution to z interpolated from list of points.
+            Solution to z evaluated from the dense output interpolant.
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (z_list[i + 1] - z_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + z_list[i]
-            #linear interpolating function, in point-slope form
+            return sol(t)[2]
         
         
         functions = mn.VGroup()  #Stores functions to plot
@@ -742,10 +699,10 @@ class LorenzOscillatorAdaptivePhase(mn.Scene):
 
         
         #Run the algorithm, but don't plot, just return solution
-        t_list, u_list = ivp.adaptive_ivp(f, u_0, t_final, err_target, [], [])
-        x_list = [u[0] for u in u_list]
-        y_list = [u[1] for u in u_list]
-        z_list = [u[2] for u in u_list]
+        t_list, u_list, sol = tc.cached(ivp.integrate_adaptive, f, u_0, t_final, err_target, dense_output = True)
+        x_list = u_list[:, 0]
+        y_list = u_list[:, 1]
+        z_list = u_list[:, 2]
         #------------------------------
         
         
@@ -794,69 +751,25 @@ class LorenzOscillatorAdaptivePhase(mn.Scene):
         
         
         #Add functions to plot
-        def largest_leq_than(t):
-            """
-            Finds the largest time value in t_list less than or equal to input t,
-            which allows us to determine which interval t is in
-            """
-            n = len(t_list)
-            
-            lower_index = 0 
-            #lower bound starts at t_list[0] which is t = 0
-            upper_index = n - 1 
-            #upper bound starts at t_list[n - 1] which is t = t_final
-            
-            #Catch t not within time range, should not happen in normal use
-            if t < t_list[0] or t > t_list[n - 1]:
-                raise Exception("t not within time range")
-            
-            #Binary search for the interval that t is in
-            while upper_index - lower_index > 1:
-                mid_index = math.floor( (lower_index + upper_index) / 2 )
-                if t == t_list[mid_index]:
-                    lower_index = mid_index
-                    upper_index = mid_index + 1
-                elif t < t_list[mid_index]:
-                    upper_index = mid_index
-                elif t > t_list[mid_index]:
-                    lower_index = mid_index
-                    
-            return lower_index 
-            #t is between t_list[lower_index] (inclusive) and t_list[lower_index + 1] exclusive
-            #except for input t = t_final
-            
-            
         def x(t):
             """
-            Solution to x interpolated from list of points.
+            Solution to x evaluated from the dense output interpolant.
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (x_list[i + 1] - x_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + x_list[i]
-            #linear interpolating function, in point-slope form
-        
-        
+            return sol(t)[0]
+
+
         def y(t):
             """
-            Solution to y interpolated from list of points.
+            Solution to y evaluated from the dense output interpolant.
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (y_list[i + 1] - y_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + y_list[i]
-            #linear interpolating function, in point-slope form
+            return sol(t)[1]
 
 
         def z(t):
             """
-            Solution to z interpolated from list of points.
+            Solution to z evaluated from the dense output interpolant.
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (z_list[i + 1] - z_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + z_list[i]
-            #linear interpolating function, in point-slope form
+            return sol(t)[2]
         
         
         def xy(t):
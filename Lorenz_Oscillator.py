@@ -4,6 +4,9 @@ Lorenz Oscillator simulation
 
 import numpy as np
 import Initial_Value_Problems as ivp
+import Parameter_Sweep as ps
+import Lyapunov_Exponents as ly
+import Poincare_Sections as pc
     
 def main():
     #Describe ODE with parameters
@@ -29,6 +32,26 @@ def main():
     err_target = 1e-6
     ivp.compare_adaptive(f, u_0_list, t_final, err_target, plot_vars, phase_vars)
     
+    #Bifurcation diagram: maxima of z for many values of p, all integrated at once
+    f_sweep = lambda t,u,params: np.array([s * (u[1] - u[0]), u[0] * (params["p"] - u[2]) - u[1], u[0] * u[1] - b * u[2]])
+    p_values = np.linspace(20, 200, 400)
+    results = ps.sweep_ivp(f_sweep, u_0_list[0], ps.param_grid(p = p_values), 0.005, 40, "classic_rk4",
+                           {"z_max": ps.Extrema(2, n_last = 32)}, t_transient = 20)
+    ps.plot_bifurcation(p_values, results["z_max"], "p", "local maxima of z")
+    
+    #Lyapunov spectrum from 20 initial conditions at once, with the variational equations
+    seeds = list(np.random.default_rng(0).normal(0, 5, (20, 3)) + np.array([0, 0, 25]))
+    exponents, t_renorm, ftle = ly.lyapunov_spectrum(f, seeds, 0.01, 100, t_transient = 10, finite_time = True)
+    print("Lyapunov exponents:", exponents.mean(axis = 0), "+/-", exponents.std(axis = 0))
+    ly.plot_lyapunov(t_renorm, ftle)
+    
+    #Poincare section z = p - 1 crossed upwards, keeping only the crossings and the return map of x
+    section = pc.plane(np.array([0, 0, 1]), p - 1)
+    return_map = pc.ReturnMap(0, 100, (-20, 20))
+    t_cross, u_cross = pc.poincare_section(f, u_0_list[0], 200, err_target, section, t_transient = 5,
+                                           return_map = return_map)
+    pc.plot_section(u_cross, [(0, 1)], return_map)
+    
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Computational Math Module 5: Lyapunov exponents and trajectory divergence for many initial conditions at once
+"""
+
+import numpy as np
+import Initial_Value_Problems as ivp
+
+FD_STEP = 1.5e-8 #relative size of the finite difference Jacobian-vector products (about sqrt of machine epsilon)
+
+
+def _tangent_rhs(f, jac, d, k, m, dtype = np.float64):
+    """
+    Builds the right-hand side of the variational system for the augmented
+    batched state x of shape (d * (k + 1), m): x[:d] is the state u and
+    x[d:] holds k tangent vectors V, with dV/dt = J(u) V
+
+    Without jac, each product J(u) v is the directional finite difference
+    (f(t, u + eps v) - f(t, u)) / eps, evaluated for every tangent vector of
+    every member in one batched call of f, with the finite difference step
+    scaled to the precision dtype the system is stepped in
+    """
+    fd_step = FD_STEP * np.sqrt(np.finfo(dtype).eps / np.finfo(np.float64).eps)
+
+    def f_aug(t, x):
+        u = x[:d]
+        V = x[d:].reshape(k, d, m)
+        f_u = np.asarray(f(t, u), dtype = dtype)
+
+        if jac is None:
+            scale = np.sqrt(np.sum(V ** 2, axis = 1)) #(k, m)
+            scale[scale == 0] = 1
+            eps = fd_step * (1 + np.sqrt(np.sum(u ** 2, axis = 0))) / scale
+            shifted = (u + eps[:, None, :] * V).transpose(1, 0, 2).reshape(d, k * m)
+            f_shift = np.asarray(f(t, shifted), dtype = dtype).reshape(d, k, m).transpose(1, 0, 2)
+            dV = (f_shift - f_u) / eps[:, None, :]
+        else:
+            dV = np.einsum("ijm,kjm->kim", np.asarray(jac(t, u), dtype = dtype), V)
+
+        return np.concatenate( (f_u, dV.reshape(k * d, m)) )
+
+    return f_aug
+
+
+def lyapunov_spectrum(f, u_0_list, dt, t_final, method = "classic_rk4", jac = None, n_exponents = None,
+                      renorm_every = 10, t_transient = 0, finite_time = False,
+                      dtype = np.float64, step_dtype = np.float64):
+    """
+    Estimates the Lyapunov exponents of du/dt = f(t,u) from every initial value
+    in u_0_list at once, integrating the system together with its variational
+    equations dV/dt = J(u) V as one batched computation
+
+    Every renorm_every steps the tangent vectors of each member are
+    orthonormalized with a QR decomposition; the logarithms of the diagonal of
+    R are the growth of each direction over that window (Benettin et al. 1980).
+    Their sum over the run divided by the time gives the exponents, and each
+    window on its own gives the finite-time exponents.
+
+    f is called with the batched state as in ivp.ensemble_ivp (u[k] is
+    component k of every member), so np.array([...]) right-hand sides work
+    unchanged.
+
+    Parameters
+    f: function of t and batched u where f = du/dt
+    u_0_list: list of initial values (np.ndarray of equal length d)
+    dt: time step
+    t_final: final time
+    method: name of a method in ivp.TABLEAUS or a Butcher tableau (a, b, c)
+            (multistep methods are not supported, renormalizing would break their history)
+    jac: function of t and batched u returning the Jacobian of every member,
+         shape (d, d, m) with jac[i, j] = df_i / du_j
+         If None, Jacobian-vector products use finite differences of f
+    n_exponents: number of exponents to compute, largest first (defaults to d)
+    renorm_every: steps between QR renormalizations
+    t_transient: time to integrate before measuring, so the orbits settle onto the attractor
+    finite_time: if True, also return the finite-time exponents of every window
+    dtype: type the exponents (and finite-time exponents) are returned in
+    step_dtype: type the state and tangent vectors are stepped and
+                orthonormalized in, see ivp.integrate_ivp; the growth of each
+                window is summed in float64 either way
+
+    Returns
+    exponents: array of shape (m, n_exponents), the spectrum from each initial value
+    t_renorm: times of the renormalizations after the transient, shape (n_windows,),
+              only returned when finite_time is True
+    ftle: finite-time exponents over the window ending at each of t_renorm,
+          shape (n_windows, m, n_exponents), only returned when finite_time is True
+    """
+    if isinstance(method, str) and method in ivp.MULTISTEP_METHODS:
+        raise Exception("Lyapunov exponents need a Runge-Kutta method, enter one of " + ", ".join(ivp.TABLEAUS))
+
+    #Setup variables
+    #----------------------------------
+    dtype, step_dtype = ivp._precision(dtype, step_dtype)
+    u_0 = np.array(u_0_list, dtype = float).T #(d, m)
+    if u_0.ndim != 2:
+        raise Exception("u_0_list must be a list of np.ndarray of equal length")
+    d, m = u_0.shape
+    k = d if n_exponents is None else n_exponents
+    if not 1 <= k <= d:
+        raise Exception("n_exponents must be between 1 and " + str(d))
+
+    x = np.empty( (d * (k + 1), m), dtype = step_dtype )
+    x[:d] = u_0
+    V = x[d:].reshape(k, d, m) #view of the tangent vectors
+    V[...] = np.eye(d)[:k, :, None]
+
+    f_aug = _tangent_rhs(f, jac, d, k, m, step_dtype)
+    workspace = ivp.RKWorkspace(method, x)
+
+    n = int(t_final / dt)
+    n_transient = min(n, int(np.ceil(t_transient / dt - 1e-9)))
+    t_list = np.linspace(0, t_final, n + 1)
+
+    log_growth = np.zeros( (m, k) )
+    t_renorm = []
+    ftle = []
+    t_window = 0 #start of the current window
+    #----------------------------------
+
+    #Integrate, renormalizing the tangent vectors every renorm_every steps
+    #----------------------------------
+    for i in range(n):
+        workspace.step(f_aug, t_list[i], x, dt)
+
+        if (i + 1) % renorm_every == 0 or i + 1 == n_transient or i + 1 == n:
+            Q, R = np.linalg.qr(V.transpose(2, 1, 0)) #one (d, k) matrix per member
+            V[...] = Q.transpose(2, 1, 0)
+            with np.errstate(divide = "ignore"):
+                growth = np.log(np.abs(np.diagonal(R, axis1 = 1, axis2 = 2)))
+
+            if i + 1 > n_transient:
+                log_growth += growth
+                if finite_time:
+                    t_renorm.append(t_list[i + 1])
+                    ftle.append( (growth / (t_list[i + 1] - t_window)).astype(dtype) )
+            t_window = t_list[i + 1]
+    #----------------------------------
+
+    duration = t_list[n] - t_list[n_transient]
+    if duration <= 0:
+        raise Exception("t_final must be larger than t_transient")
+    exponents = (log_growth / duration).astype(dtype)
+
+    if finite_time:
+        return exponents, np.array(t_renorm), np.array(ftle, dtype = dtype).reshape(len(ftle), m, k)
+    return exponents
+
+
+def divergence(f, u_0_list, dt, t_final, method, delta = 1e-8):
+    """
+    Follows how fast nearby trajectories separate: each initial value is paired
+    with a copy displaced by delta along (1, 1, ..., 1), and both are integrated
+    in a single ensemble
+    The slope of the log separation before it saturates at the size of the
+    attractor estimates the largest Lyapunov exponent
+
+    Parameters
+    f: function of t and batched u where f = du/dt, see ivp.ensemble_ivp
+    u_0_list: list of initial values (np.ndarray of equal length d)
+    dt: time step
+    t_final: final time
+    method: name of a fixed step method, see ivp.ensemble_ivp
+    delta: distance between the initial values of each pair
+
+    Returns
+    t_list: array of time points, shape (n + 1,)
+    log_separation: natural log of the distance within each pair, shape (m, n + 1)
+    """
+    u_0 = np.array(u_0_list, dtype = float)
+    shift = delta / np.sqrt(u_0.shape[1])
+    u_list = ivp.ensemble_ivp(f, list(u_0) + list(u_0 + shift), dt, t_final, method)
+
+    m = len(u_0)
+    t_list = np.linspace(0, t_final, u_list.shape[1])
+    with np.errstate(divide = "ignore"):
+        log_separation = np.log(np.linalg.norm(u_list[m:] - u_list[:m], axis = -1))
+    return t_list, log_separation
+
+
+def plot_lyapunov(t_renorm, ftle):
+    """
+    Plots the running Lyapunov exponent estimates over time (mean over the
+    initial values with the range they span) and the distribution of the
+    largest finite-time exponent
+
+    Parameters
+    t_renorm: times of the renormalizations, from lyapunov_spectrum with finite_time = True
+    ftle: finite-time exponents, shape (n_windows, m, k)
+
+    Results
+    Figure with the convergence of every exponent and a histogram of the largest one
+    """
+    import matplotlib.pyplot as plt #only needed for the figure
+
+    #Window lengths, the first taken equal to the second (all are renorm_every * dt but possibly the last)
+    windows = np.diff(t_renorm, prepend = 2 * t_renorm[0] - t_renorm[1]) if len(t_renorm) > 1 else np.ones(1)
+    running = np.cumsum(ftle * windows[:, None, None], axis = 0) / np.cumsum(windows)[:, None, None]
+
+    fig = plt.figure( figsize = (12, 5) )
+    ax = fig.subplots(1, 2)
+    for j in range(ftle.shape[2]):
+        line, = ax[0].plot(t_renorm, running[:, :, j].mean(axis = 1), label = "$\\lambda_{" + str(j + 1) + "}$")
+        ax[0].fill_between(t_renorm, running[:, :, j].min(axis = 1), running[:, :, j].max(axis = 1),
+                           color = line.get_color(), alpha = 0.3)
+    ax[0].set_title("Running estimates")
+    ax[0].set_xlabel("t")
+    ax[0].legend()
+
+    ax[1].hist(ftle[:, :, 0].ravel(), bins = 50)
+    ax[1].set_title("Largest finite-time exponent")
+    ax[1].set_xlabel("$\\lambda_1$ over one window")
@@ -0,0 +1,155 @@
+"""
+Computational Math Module 5: Parallel ensembles of Initial Value Problems
+"""
+
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import Initial_Value_Problems as ivp
+
+_worker_f = {} #unpickled right-hand sides, cached per worker process by their pickled bytes
+
+
+def dumps_rhs(f):
+    """
+    Pickles a right-hand side so it can be sent to worker processes
+    Module-level functions, functools.partial objects and instances of
+    module-level classes pickle directly. Lambdas and closures need the
+    optional cloudpickle package.
+
+    Parameters
+    f: function of t and u where f = du/dt
+
+    Returns
+    f_bytes: pickled f
+    """
+    try:
+        return pickle.dumps(f)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        pass
+
+    try:
+        import cloudpickle
+    except ImportError:
+        raise Exception("f cannot be pickled: define it at module level (or use functools.partial), "
+                        "or install cloudpickle to send lambdas to worker processes")
+    return cloudpickle.dumps(f)
+
+
+def _loads_rhs(f_bytes):
+    """
+    Unpickles a right-hand side, once per worker process
+    """
+    if f_bytes not in _worker_f:
+        _worker_f[f_bytes] = pickle.loads(f_bytes)
+    return _worker_f[f_bytes]
+
+
+def _adaptive_chunk(f_bytes, u_0_chunk, t_final, err_target, method, stats, dtype, step_dtype):
+    """
+    Worker task: solves the IVP for every initial value in one chunk
+    """
+    f = _loads_rhs(f_bytes)
+    return [ivp.integrate_adaptive(f, u_0, t_final, err_target, method, stats = stats,
+                                   dtype = dtype, step_dtype = step_dtype) for u_0 in u_0_chunk]
+
+
+def integrate_compare_adaptive_parallel(f, u_0_list, t_final, err_target, method = "dopri5",
+                                        max_workers = None, chunk_size = None, stats = False,
+                                        dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final
+    for multiple different initial values, spread over a pool of processes
+    Each trajectory chooses its own steps, so they are run independently
+    rather than as one vectorized batch (compare ivp.ensemble_ivp)
+
+    Parameters
+    f: function of t and u where f = du/dt, must be picklable (see dumps_rhs)
+    u_0_list: list of initial values
+    t_final: final time
+    err_target: target step error
+    method: embedded pair to use, see ivp.integrate_adaptive
+    max_workers: number of processes, defaults to the number of CPUs
+    chunk_size: initial values per task, defaults to about four tasks per process
+                so that fast and slow trajectories balance out
+    stats: if True, also return an ivp.SolverStats totalled over every initial
+           condition (its timings add up the time spent in every worker)
+    dtype: type the solutions are stored in (np.float32 also halves what the
+           workers send back), see ivp.integrate_adaptive
+    step_dtype: type the steps are computed in, see ivp.integrate_adaptive
+
+    Returns
+    t_list: list of time point arrays, one per initial condition (in input order)
+    u_list: list of solution arrays, one per initial condition (in input order)
+    solver_stats: ivp.SolverStats, only returned when stats is True
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(u_0_list) // (4 * max_workers)))
+
+    f_bytes = dumps_rhs(f)
+    chunks = [u_0_list[i:i + chunk_size] for i in range(0, len(u_0_list), chunk_size)]
+
+    t_list = []
+    u_list = []
+    solver_stats = None
+    if stats:
+        solver_stats = ivp.SolverStats()
+        solver_stats.set_precision(dtype, step_dtype)
+
+    with ProcessPoolExecutor(max_workers = max_workers) as executor:
+        futures = [executor.submit(_adaptive_chunk, f_bytes, chunk, t_final, err_target, method, stats,
+                                   dtype, step_dtype) for chunk in chunks]
+
+        #Collect in submission order, so results line up with u_0_list
+        for future in futures:
+            for results in future.result():
+                t_list.append(results[0])
+                u_list.append(results[1])
+                if stats:
+                    solver_stats.merge(results[2])
+
+    if stats:
+        return t_list, u_list, solver_stats
+    return t_list, u_list
+
+
+def compare_adaptive_parallel(f, u_0_list, t_final, err_target, plot_vars, phase_vars, method = "dopri5",
+                              max_workers = None, chunk_size = None, stats = False,
+                              dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final
+    for multiple different initial values in parallel, plots solution for all u_0
+
+    Parameters
+    f: function of t and u where f = du/dt, must be picklable (see dumps_rhs)
+    u_0_list: list of initial values
+    t_final: final time
+    err_target: target step error
+    plot_vars: variables to plot against time
+    phase_vars: variables to plot in phase diagram (list of ordered pairs)
+    method: embedded pair to use, see ivp.integrate_adaptive
+    max_workers: number of processes, see integrate_compare_adaptive_parallel
+    chunk_size: initial values per task, see integrate_compare_adaptive_parallel
+    stats: if True, also return an ivp.SolverStats including the plotting time
+    dtype: type the solutions are stored in, see ivp.integrate_adaptive
+    step_dtype: type the steps are computed in, see ivp.integrate_adaptive
+
+    Results
+    Plots the time series of chosen variables
+    Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty
+
+    Returns
+    t_list: list of time point arrays, one per initial condition
+    u_list: list of solution arrays, one per initial condition
+    solver_stats: ivp.SolverStats, only returned when stats is True
+    """
+    results = integrate_compare_adaptive_parallel(f, u_0_list, t_final, err_target, method,
+                                                  max_workers, chunk_size, stats, dtype, step_dtype)
+    ivp._timed_plot(results[-1] if stats else None, ivp.plot_compare, results[0], results[1],
+                    plot_vars, phase_vars)
+
+    return results
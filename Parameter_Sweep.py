@@ -0,0 +1,272 @@
+"""
+Computational Math Module 5: Vectorized parameter sweeps with on-the-fly reductions
+"""
+
+import numpy as np
+import Initial_Value_Problems as ivp
+
+
+def param_grid(**values):
+    """
+    Builds every combination of the given parameter values
+
+    Parameters
+    values: one keyword per parameter, each a 1-d array of values to scan
+
+    Returns
+    params: dict of arrays, all with the grid shape (len(values[0]), len(values[1]), ...)
+
+    Example
+    params = param_grid(mu = np.linspace(0.1, 5, 100), a = np.array([0., 0.5]))
+    """
+    names = list(values)
+    grids = np.meshgrid(*[np.asarray(values[name], dtype = float) for name in names], indexing = "ij")
+    return dict(zip(names, grids))
+
+
+#Reductions: each sees the batched state after every step and keeps only what it needs
+#update is called with the time and the state of shape (d, m), or (m,) for a scalar equation
+#----------------------------------
+class Mean:
+    """
+    Time average of one variable over the part of the run after the transient
+
+    Parameters
+    var: index of the variable (ignored for a scalar equation)
+    """
+    def __init__(self, var = 0):
+        self.var = var
+
+    def start(self, t, u):
+        self.total = np.zeros(u.shape[-1])
+        self.duration = 0.
+        self.t_prev = t
+        self.x_prev = _component(u, self.var).copy()
+
+    def update(self, t, u):
+        x = _component(u, self.var)
+        self.total += (t - self.t_prev) * (x + self.x_prev) / 2 #trapezoid rule
+        self.duration += t - self.t_prev
+        self.t_prev = t
+        self.x_prev[...] = x
+
+    def result(self):
+        return self.total / self.duration if self.duration > 0 else np.full_like(self.total, np.nan)
+
+
+class Extrema:
+    """
+    The last n local maxima (or minima) of one variable, located with a
+    parabola through the three points around each one
+    The values for a member with fewer extrema are NaN; a fixed point gives
+    none, a limit cycle repeats the same few values and chaos gives many.
+
+    Parameters
+    var: index of the variable (ignored for a scalar equation)
+    n_last: number of extrema kept per member
+    kind: "max" or "min"
+    """
+    def __init__(self, var = 0, n_last = 16, kind = "max"):
+        if kind not in ["max", "min"]:
+            raise Exception("kind must be \"max\" or \"min\"")
+        self.var = var
+        self.n_last = n_last
+        self.sign = 1 if kind == "max" else -1
+
+    def start(self, t, u):
+        m = u.shape[-1]
+        self.values = np.full( (m, self.n_last), np.nan )
+        self.count = np.zeros(m, dtype = int)
+        self.x1 = self.sign * _component(u, self.var).copy() #state one step back
+        self.x2 = np.full(m, np.nan) #state two steps back
+
+    def update(self, t, u):
+        x = self.sign * _component(u, self.var)
+        found = np.nonzero( (self.x1 > self.x2) & (self.x1 >= x) )[0]
+        if len(found):
+            #Vertex of the parabola through three equally spaced points
+            a, b, c = self.x2[found], self.x1[found], x[found]
+            curvature = a - 2 * b + c
+            with np.errstate(divide = "ignore", invalid = "ignore"):
+                peak = np.where(curvature < 0, b - (c - a) ** 2 / (8 * curvature), b)
+            self.values[found, self.count[found] % self.n_last] = self.sign * peak
+            self.count[found] += 1
+        self.x2, self.x1 = self.x1, self.x2
+        self.x1[...] = x
+
+    def result(self):
+        #Oldest first: once the buffer has wrapped around, the oldest is at count % n_last
+        oldest = np.where(self.count >= self.n_last, self.count % self.n_last, 0)
+        order = (oldest[:, None] + np.arange(self.n_last)) % self.n_last
+        return np.take_along_axis(self.values, order, axis = 1)
+
+
+class Period:
+    """
+    Mean time between upward crossings of a level by one variable
+    NaN for members that cross fewer than twice after the transient
+
+    Parameters
+    var: index of the variable (ignored for a scalar equation)
+    level: value whose upward crossings are timed
+    """
+    def __init__(self, var = 0, level = 0.):
+        self.var = var
+        self.level = level
+
+    def start(self, t, u):
+        m = u.shape[-1]
+        self.first = np.full(m, np.nan)
+        self.last = np.full(m, np.nan)
+        self.count = np.zeros(m, dtype = int)
+        self.t_prev = t
+        self.x_prev = _component(u, self.var) - self.level
+
+    def update(self, t, u):
+        x = _component(u, self.var) - self.level
+        crossed = np.nonzero( (self.x_prev < 0) & (x >= 0) )[0]
+        if len(crossed):
+            #Linear interpolation for the crossing time
+            t_cross = self.t_prev + (t - self.t_prev) * self.x_prev[crossed] / (self.x_prev[crossed] - x[crossed])
+            first = crossed[self.count[crossed] == 0]
+            self.first[first] = t_cross[self.count[crossed] == 0]
+            self.last[crossed] = t_cross
+            self.count[crossed] += 1
+        self.t_prev = t
+        self.x_prev = x
+
+    def result(self):
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            return np.where(self.count >= 2, (self.last - self.first) / (self.count - 1), np.nan)
+
+
+class Final:
+    """
+    State at t_final, shape (m,) for a scalar equation or (m, d)
+    """
+    def start(self, t, u):
+        self.u = u
+
+    def update(self, t, u):
+        self.u = u
+
+    def result(self):
+        return np.array(self.u).T
+#----------------------------------
+
+
+def _component(u, var):
+    """
+    Selects one variable of every member from a batched state
+    """
+    return u if u.ndim == 1 else u[var]
+
+
+def sweep_ivp(f, u_0, params, dt, t_final, method, reductions, t_transient = 0, per_member = False,
+              dtype = np.float64, step_dtype = np.float64):
+    """
+    Solves du/dt = f(t, u, params) for every combination of parameter values at
+    once, as one batched integration, and reduces each trajectory on the fly
+    instead of storing it
+
+    f is called with the batched state as in ivp.ensemble_ivp (u[k] is
+    component k of every member) and with params holding one value per member,
+    so right-hand sides written with numpy operations work unchanged, e.g.
+        f = lambda t,u,p: np.array([ u[1] , p["mu"] * (1 - u[0] ** 2) * u[1] - u[0] ])
+
+    Parameters
+    f: function of t, batched u and params where f = du/dt
+    u_0: initial value shared by every member (float or np.ndarray of shape (d,)),
+         or with per_member an array of the grid shape (scalar equation) or of
+         shape (d,) + grid shape giving each member its own
+    params: dict of parameter arrays with a common grid shape, see param_grid
+    dt: time step
+    t_final: final time
+    method: name of a fixed step method, see ivp.integrate_ivp
+    reductions: dict of reductions (Mean, Extrema, Period, Final) by name
+    t_transient: reductions only see the solution from this time on
+    per_member: if True, u_0 holds one initial value per member instead of a shared one
+    dtype: type the results of the reductions are returned in
+    step_dtype: type the steps are computed in, see ivp.integrate_ivp; with
+                np.float32 the parameters are passed to f in single precision
+                too, so the whole batched step runs in float32
+
+    Returns
+    results: dict with the result of each reduction by name, with the grid shape
+             as the leading dimensions (e.g. Extrema gives grid shape + (n_last,))
+    """
+    #Setup variables
+    #----------------------------------
+    dtype, step_dtype = ivp._precision(dtype, step_dtype)
+    names = list(params)
+    shape = np.shape(params[names[0]])
+    m = int(np.prod(shape))
+    flat_params = {name: np.broadcast_to(params[name], shape).reshape(m).astype(step_dtype) for name in names}
+
+    u_0 = np.asarray(u_0, dtype = float)
+    if not per_member: #shared initial value, a float or a state of length d
+        if u_0.ndim > 1:
+            raise Exception("A shared u_0 must be a float or a 1-d array, use per_member = True for one value per member")
+        u = np.full(m, float(u_0)) if u_0.ndim == 0 else np.repeat(u_0[:, None], m, axis = 1)
+    elif u_0.shape == shape: #scalar equation, one value per member
+        u = u_0.reshape(m)
+    elif u_0.shape[1:] == shape:
+        u = u_0.reshape(len(u_0), m)
+    else:
+        raise Exception("With per_member, u_0 must have the grid shape " + str(shape) + " or (d,) + grid shape")
+
+    u = u.astype(step_dtype) #always a new array, stepped in place
+    f_batch = lambda t, u: f(t, u, flat_params)
+    workspace = ivp.make_workspace(method, u)
+
+    n = int(t_final / dt)
+    n_transient = min(n, int(np.ceil(t_transient / dt - 1e-9)))
+    t_list = np.linspace(0, t_final, n + 1)
+    #----------------------------------
+
+    #Integrate, handing the state to the reductions after the transient
+    #----------------------------------
+    for i in range(n):
+        if i == n_transient:
+            for reduction in reductions.values():
+                reduction.start(t_list[i], u)
+        workspace.step(f_batch, t_list[i], u, dt)
+        if i >= n_transient:
+            for reduction in reductions.values():
+                reduction.update(t_list[i + 1], u)
+    if n_transient == n:
+        for reduction in reductions.values():
+            reduction.start(t_list[n], u)
+    #----------------------------------
+
+    results = {}
+    for name, reduction in reductions.items():
+        result = np.asarray(reduction.result())
+        if result.dtype.kind == "f":
+            result = result.astype(dtype, copy = False)
+        results[name] = result.reshape(shape + result.shape[1:])
+    return results
+
+
+def plot_bifurcation(values, extrema, xlabel, ylabel):
+    """
+    Plots a bifurcation diagram: every extremum found for each parameter value
+
+    Parameters
+    values: 1-d array of parameter values
+    extrema: array of shape (len(values), n_last) from Extrema
+    xlabel: name of the parameter
+    ylabel: name of the variable
+
+    Results
+    Scatter plot of the extrema against the parameter
+    """
+    import matplotlib.pyplot as plt #sweeps run without loading pyplot
+
+    fig = plt.figure( figsize = (12, 8) )
+    ax = fig.subplots(1, 1)
+    x = np.repeat(np.asarray(values)[:, None], extrema.shape[1], axis = 1)
+    ax.plot(x.ravel(), extrema.ravel(), ",k")
+    ax.set_title("Bifurcation diagram")
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
@@ -0,0 +1,169 @@
+"""
+Computational Math Module 5: Streaming Poincare sections and return maps
+"""
+
+import numpy as np
+import Initial_Value_Problems as ivp
+
+
+def plane(normal, offset, direction = 1):
+    """
+    Builds the section function of the plane normal . u = offset, in the form
+    of an event function g(t, u) (see ivp.EventTracker)
+
+    Parameters
+    normal: normal vector of the plane (np.ndarray)
+    offset: value of normal . u on the plane
+    direction: only count crossings where normal . u increases (+1) or
+               decreases (-1), 0 counts both
+
+    Returns
+    g: function of t and u, zero on the plane
+
+    Example
+    g = plane(np.array([0, 0, 1]), 27) #the plane z = 27, crossed upwards
+    """
+    normal = np.asarray(normal, dtype = float)
+    g = lambda t, u: float(np.dot(normal, u)) - offset
+    g.direction = direction
+    return g
+
+
+class ReturnMap:
+    """
+    Histogram of the return map x_n -> x_n+1 of one variable at successive
+    section crossings, filled as the crossings are found, so its memory is
+    bins^2 counts however long the run
+
+    Parameters
+    var: index of the variable
+    bins: number of bins along each axis
+    limits: (low, high) range of the variable covered by the histogram,
+            pairs outside it are only counted in n_outside
+    """
+    def __init__(self, var, bins, limits):
+        self.var = var
+        self.edges = np.linspace(limits[0], limits[1], bins + 1)
+        self.counts = np.zeros( (bins, bins), dtype = np.int64 ) #counts[i, j]: x_n in bin i, x_n+1 in bin j
+        self.n_outside = 0
+        self.bin_prev = None #bin of the last crossing, -1 if outside
+
+    def _bin(self, x):
+        i = int(np.floor( (x - self.edges[0]) / (self.edges[-1] - self.edges[0]) * len(self.counts) ))
+        return i if 0 <= i < len(self.counts) else -1
+
+    def add(self, u):
+        """
+        Adds the crossing point u, pairing it with the previous one
+        """
+        i = self._bin(np.atleast_1d(u)[self.var])
+        if self.bin_prev is not None:
+            if self.bin_prev >= 0 and i >= 0:
+                self.counts[self.bin_prev, i] += 1
+            else:
+                self.n_outside += 1
+        self.bin_prev = i
+
+
+def poincare_section(f, u_0, t_final, err_target, section, method = "dopri5", dt_0 = 0.01,
+                     t_transient = 0, keep_points = True, return_map = None):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with adaptive time step until time t_final
+    and keeps only the crossings of a section, without storing the trajectory
+
+    Crossings are found by a sign change of the section function between two
+    steps and located on the cubic Hermite interpolant of the step, as for the
+    events of ivp.integrate_adaptive. The memory used grows with the number of
+    crossings kept (or not at all with keep_points = False), not with t_final.
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    section: function g(t, u) that is zero on the section, e.g. from plane;
+             an attribute direction (+1 or -1) keeps only crossings in that direction
+    method: embedded pair to use, see ivp.integrate_adaptive
+    dt_0: first trial time step
+    t_transient: crossings before this time are ignored
+    keep_points: if True, store the crossing times and points
+    return_map: ReturnMap to fill with the crossings, or None
+
+    Returns
+    t_cross: array of crossing times, shape (n,) (empty without keep_points)
+    u_cross: array of the solution at the crossings, shape (n,) or (n, d)
+    """
+    #Setup variables
+    #----------------------------------
+    u = ivp._initial_state(u_0)
+    workspace = ivp.EmbeddedRKWorkspace(method, u)
+    direction = getattr(section, "direction", 0)
+
+    t_cross = ivp.GrowableArray()
+    u_cross = ivp.GrowableArray(u.shape)
+
+    t_prev = 0
+    u_prev = u.copy()
+    du_prev = np.array(workspace.derivative(f, 0, u), dtype = float).reshape(u.shape)
+    g_prev = section(0, u)
+    #----------------------------------
+
+    #Integrate, checking every step for a crossing
+    #----------------------------------
+    for t in ivp._adaptive_steps(f, u, t_final, err_target, workspace, dt_0):
+        g_new = section(t, u)
+        du = workspace.derivative(f, t, u) #reused as the first stage of the next step, so free
+        crossed = (g_prev < 0 and g_new >= 0) or (g_prev > 0 and g_new <= 0)
+
+        if crossed and direction * (g_new - g_prev) >= 0 and t > t_transient:
+            t_event, u_event = ivp._locate_crossing(section, g_prev, g_new, t_prev, u_prev, du_prev, t, u, du)
+            if t_event >= t_transient:
+                if keep_points:
+                    t_cross.append(t_event)
+                    u_cross.append(u_event)
+                if return_map is not None:
+                    return_map.add(u_event)
+
+        t_prev = t
+        g_prev = g_new
+        np.copyto(u_prev, u)
+        du_prev[...] = du
+    #----------------------------------
+
+    return t_cross.trim(), u_cross.trim()
+
+
+def plot_section(u_cross, section_vars, return_map = None):
+    """
+    Plots the crossing points projected on pairs of variables and the
+    return map histogram
+
+    Parameters
+    u_cross: solution at the crossings, shape (n, d)
+    section_vars: variables to plot against each other (list of ordered pairs)
+    return_map: filled ReturnMap to show as well, or None
+
+    Results
+    Scatter plot of the crossings for each pair of variables
+    Histogram of the return map on a log scale
+    """
+    import matplotlib.pyplot as plt #as in ivp.plot_solution, not loaded for headless runs
+
+    n_plots = len(section_vars) + (return_map is not None)
+    if n_plots == 0:
+        return
+    fig = plt.figure( figsize = (6 * n_plots, 5) )
+    ax = np.atleast_1d(fig.subplots(1, n_plots))
+
+    for cur_ax, (i, j) in zip(ax, section_vars):
+        cur_ax.plot(u_cross[:, i], u_cross[:, j], ".k", markersize = 1)
+        cur_ax.set_title("Poincare section")
+        cur_ax.set_xlabel("u[" + str(i) + "]")
+        cur_ax.set_ylabel("u[" + str(j) + "]")
+
+    if return_map is not None:
+        edges = return_map.edges
+        ax[-1].pcolormesh(edges, edges, np.log1p(return_map.counts.T))
+        ax[-1].set_title("Return map (log count)")
+        ax[-1].set_xlabel("$x_n$")
+        ax[-1].set_ylabel("$x_{n+1}$")
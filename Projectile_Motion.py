@@ -5,34 +5,30 @@ Projectile motion with air resistance simulation
 import numpy as np
 import matplotlib.pyplot as plt
 import Initial_Value_Problems as ivp
-import Integration as integrate
         
     
 def main():
     #Describe ODE and initial condition
-    #u[0] is x velocity, u[1] is y velocity
-    f = lambda t,u: np.array([- 1/ 8 * np.sqrt(u[0] ** 2 + u[1] ** 2) * u[0], - 4 - 1/ 8 * np.sqrt(u[0] ** 2 + u[1] ** 2) * u[1] ])
-    u_0 = np.array([5., 12.])
+    #u[0] is x velocity, u[1] is y velocity, u[2] is x position, u[3] is y position
+    f = lambda t,u: np.array([- 1/ 8 * np.sqrt(u[0] ** 2 + u[1] ** 2) * u[0], - 4 - 1/ 8 * np.sqrt(u[0] ** 2 + u[1] ** 2) * u[1], u[0], u[1] ])
+    u_0 = np.array([5., 12., 0., 0.])
+    
+    #Stop when the projectile comes back down to y = 0
+    landing = lambda t,u: u[3]
+    landing.terminal = True
+    landing.direction = -1
     
     #Parameters for numerical integration
     dt = 0.01
-    t_final = 3.61
+    t_final = 10 #upper bound, the landing event ends the integration
     plot_vars = []
     phase_vars = []
     method = "equal_rk4"
     
-    #Since we solved for x velocity and y velocity
-    #we must integrate to solve for x position and y position
-  
-    #Variables needed for integration
-    t_list = np.linspace(0, t_final, t_final/dt)
-    u_list = ivp.solve_ivp(f, u_0, dt, t_final, method, plot_vars, phase_vars)
-    dxdt_list = u_list[:,0]
-    dydt_list = u_list[:,1]
-    
-    #Find position using an accumulation function of velocity
-    x_list = integrate.accumulate_points(t_list,dxdt_list,"simpson")
-    y_list = integrate.accumulate_points(t_list,dydt_list,"simpson")
+    #Integrate velocity and position together until landing
+    t_list, u_list, t_events, u_events = ivp.solve_ivp(f, u_0, dt, t_final, method, plot_vars, phase_vars, [landing])
+    x_list = u_list[:,2]
+    y_list = u_list[:,3]
     
     #Plot the results of the projectile motion
     fig = plt.figure( figsize = (18,6) )
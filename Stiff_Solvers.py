@@ -0,0 +1,442 @@
+"""
+Computational Math Module 5: Implicit solvers for stiff Initial Value Problems
+"""
+
+import numpy as np
+import Initial_Value_Problems as ivp
+
+#Constants of the variable order BDF method (numerical differentiation formulas)
+#----------------------------------
+MAX_ORDER = 5
+NEWTON_MAXITER = 4 #Newton iterations before the step is declared non-convergent
+NEWTON_TOL = 0.03 #Newton convergence tolerance, relative to err_target
+MIN_FACTOR = 0.2 #smallest allowed step size change
+MAX_FACTOR = 10 #largest allowed step size change
+
+KAPPA = np.array([0, -0.1850, -1/9, -0.0823, -0.0415, 0])
+GAMMA = np.hstack( (0, np.cumsum(1 / np.arange(1, MAX_ORDER + 1))) )
+ALPHA = (1 - KAPPA) * GAMMA
+ERROR_CONST = KAPPA * GAMMA + 1 / np.arange(1, MAX_ORDER + 2)
+#----------------------------------
+
+
+def finite_difference_jacobian(f, t, u, f_u = None):
+    """
+    Approximates the Jacobian df/du at (t, u) with forward differences
+
+    Parameters
+    f: function of t and u where f = du/dt
+    t: time
+    u: state (1-d array)
+    f_u: f(t, u) if already known
+
+    Returns
+    jac: d x d matrix with jac[i, j] = df_i / du_j
+    """
+    if f_u is None:
+        f_u = f(t, u)
+
+    d = len(u)
+    jac = np.empty( (d, d) )
+    u_shift = u.copy()
+
+    for j in range(d):
+        h = np.sqrt(np.finfo(float).eps) * max(1, abs(u[j]))
+        u_shift[j] = u[j] + h
+        jac[:, j] = (f(t, u_shift) - f_u) / h
+        u_shift[j] = u[j]
+
+    return jac
+
+
+def lu_factor(A):
+    """
+    LU factorization with partial pivoting, so that A[perm] = L U
+
+    Parameters
+    A: square matrix
+
+    Returns
+    lu: L (below the diagonal, unit diagonal implied) and U stored together
+    perm: row permutation
+    """
+    lu = np.array(A, dtype = float)
+    d = len(lu)
+    perm = np.arange(d)
+
+    for k in range(d - 1):
+        p = k + np.argmax(np.abs(lu[k:, k])) #pivot row
+        if p != k:
+            lu[[k, p]] = lu[[p, k]]
+            perm[[k, p]] = perm[[p, k]]
+        if lu[k, k] != 0:
+            lu[k + 1:, k] /= lu[k, k]
+            lu[k + 1:, k + 1:] -= np.outer(lu[k + 1:, k], lu[k, k + 1:])
+
+    return lu, perm
+
+
+def lu_solve(lu_perm, b):
+    """
+    Solves A x = b given the factorization returned by lu_factor
+    """
+    lu, perm = lu_perm
+    d = len(lu)
+    x = b[perm].astype(float)
+
+    for i in range(1, d): #forward substitution with unit lower triangle
+        x[i] -= lu[i, :i] @ x[:i]
+    for i in range(d - 1, -1, -1): #back substitution with upper triangle
+        x[i] = (x[i] - lu[i, i + 1:] @ x[i + 1:]) / lu[i, i]
+
+    return x
+
+
+def _compute_R(order, factor):
+    """
+    Matrix that maps backward differences at step h to those at step factor * h
+    """
+    I = np.arange(1, order + 1)[:, None]
+    J = np.arange(1, order + 1)
+    M = np.zeros( (order + 1, order + 1) )
+    M[1:, 1:] = (I - 1 - factor * J) / I
+    M[0] = 1
+    return np.cumprod(M, axis = 0)
+
+
+def _change_D(D, order, factor):
+    """
+    Rescales the backward differences D in place for a step size change by factor
+    """
+    R = _compute_R(order, factor)
+    U = _compute_R(order, 1)
+    D[:order + 1] = (R @ U).T @ D[:order + 1]
+
+
+def _solve_bdf_system(f, t_new, u_predict, c, psi, lu_perm, tol):
+    """
+    Solves the implicit BDF equation for the new state with a simplified
+    Newton iteration that reuses the factorization of I - c J
+
+    Returns
+    converged: whether the iteration converged
+    n_iter: number of iterations (RHS calls) used
+    u: new state
+    d: correction from the predicted state
+    """
+    d = np.zeros_like(u_predict)
+    u = u_predict.copy()
+    dy_norm_old = None
+    converged = False
+
+    for k in range(NEWTON_MAXITER):
+        f_u = f(t_new, u)
+        if not np.all(np.isfinite(f_u)):
+            break
+
+        dy = lu_solve(lu_perm, c * f_u - psi - d)
+        dy_norm = np.linalg.norm(dy)
+        rate = None if dy_norm_old is None else dy_norm / dy_norm_old
+
+        #Give up if the iteration diverges or is too slow to finish in time
+        if rate is not None and (rate >= 1 or rate ** (NEWTON_MAXITER - k) / (1 - rate) * dy_norm > tol):
+            break
+
+        u += dy
+        d += dy
+
+        if dy_norm == 0 or (rate is not None and rate / (1 - rate) * dy_norm < tol):
+            converged = True
+            break
+
+        dy_norm_old = dy_norm
+
+    return converged, k + 1, u, d
+
+
+def _bdf_steps(f, u_0, t_final, err_target, jac, dt_0, solver_stats = None):
+    """
+    Runs the variable order BDF method from t = 0 to t_final, yielding
+    (t, u, du) at the initial point and after every accepted step, where
+    du is du/dt from the backward difference interpolant (no extra RHS calls)
+    u and du have the shape of u_0 and are fresh arrays on every yield
+    Rejected steps, Jacobians and LU factorizations are counted in
+    solver_stats if it is given
+    """
+    #Setup variables
+    #----------------------------------
+    if isinstance(u_0, float):
+        u = np.array([u_0])
+        f_vec = lambda t, u: np.atleast_1d(f(t, u[0]))
+        jac_vec = None if jac is None else lambda t, u: np.atleast_2d(jac(t, u[0]))
+    elif isinstance(u_0, np.ndarray):
+        u = np.array(u_0, dtype = float)
+        f_vec = f
+        jac_vec = jac
+    else:
+        raise Exception("Initial condition must be float or np.ndarray of floats")
+
+    if jac_vec is None:
+        jac_vec = lambda t, u: finite_difference_jacobian(f_vec, t, u)
+    if solver_stats is not None:
+        jac_uncounted = jac_vec
+        def jac_vec(t, u):
+            solver_stats.n_jac += 1
+            return jac_uncounted(t, u)
+
+    t = 0
+    shape = np.shape(u_0)
+    d = len(u)
+    identity = np.eye(d)
+
+    f_0 = f_vec(t, u)
+    if dt_0 is None:
+        f_norm = np.linalg.norm(f_0)
+        dt_0 = 1e-6 if f_norm == 0 else 0.01 * max(np.linalg.norm(u), 1e-5) / f_norm
+    dt = min(dt_0, t_final)
+
+    #D holds the backward differences of the solution, scaled by the step size
+    D = np.zeros( (MAX_ORDER + 3, d) )
+    D[0] = u
+    D[1] = f_0 * dt
+
+    order = 1
+    n_equal_steps = 0
+    J = jac_vec(t, u)
+    current_jac = True
+    lu_perm = None
+
+    yield t, u.reshape(shape), f_0.reshape(shape)
+    #----------------------------------
+
+    #Integrate the IVP
+    #----------------------------------
+    while t < t_final:
+        step_accepted = False
+
+        while not step_accepted:
+            min_step = 10 * abs(np.nextafter(t, np.inf) - t)
+            if dt < min_step:
+                raise Exception("Step size fell below the minimum at t = " + str(t))
+
+            t_new = t + dt
+            if t_new > t_final: #land exactly on t_final
+                t_new = t_final
+                _change_D(D, order, (t_new - t) / dt)
+                n_equal_steps = 0
+                lu_perm = None
+            dt = t_new - t
+
+            u_predict = np.sum(D[:order + 1], axis = 0)
+            psi = D[1:order + 1].T @ GAMMA[1:order + 1] / ALPHA[order]
+            c = dt / ALPHA[order]
+
+            converged = False
+            while not converged:
+                if lu_perm is None:
+                    lu_perm = lu_factor(identity - c * J)
+                    if solver_stats is not None:
+                        solver_stats.n_lu += 1
+                converged, n_iter, u_new, correction = _solve_bdf_system(f_vec, t_new, u_predict, c, psi,
+                                                                         lu_perm, NEWTON_TOL * err_target)
+                if not converged:
+                    if current_jac:
+                        break
+                    J = jac_vec(t_new, u_predict) #stale Jacobian, refresh and retry
+                    lu_perm = None
+                    current_jac = True
+
+            if not converged:
+                if solver_stats is not None:
+                    solver_stats.n_rejected += 1
+                factor = 0.5
+                dt *= factor
+                _change_D(D, order, factor)
+                n_equal_steps = 0
+                lu_perm = None
+                continue
+
+            safety = 0.9 * (2 * NEWTON_MAXITER + 1) / (2 * NEWTON_MAXITER + n_iter)
+            error_norm = np.linalg.norm(ERROR_CONST[order] * correction) / err_target
+
+            if error_norm > 1: #reject, the factorization is kept until the step changes
+                if solver_stats is not None:
+                    solver_stats.n_rejected += 1
+                factor = max(MIN_FACTOR, safety * error_norm ** (-1 / (order + 1)))
+                dt *= factor
+                _change_D(D, order, factor)
+                n_equal_steps = 0
+                lu_perm = None
+            else:
+                step_accepted = True
+
+        #Accept the step and update the backward differences
+        n_equal_steps += 1
+        t = t_new
+        u = u_new
+        current_jac = False
+
+        D[order + 2] = correction - D[order + 1]
+        D[order + 1] = correction
+        for i in reversed(range(order + 1)):
+            D[i] += D[i + 1]
+
+        du = (1 / np.arange(1, order + 1)) @ D[1:order + 1] / dt #derivative of the interpolant at t
+        yield t, u.reshape(shape), du.reshape(shape)
+
+        #Consider an order change once enough equal steps have been taken
+        if n_equal_steps < order + 1:
+            continue
+
+        error_m_norm = np.inf
+        error_p_norm = np.inf
+        if order > 1:
+            error_m_norm = np.linalg.norm(ERROR_CONST[order - 1] * D[order]) / err_target
+        if order < MAX_ORDER:
+            error_p_norm = np.linalg.norm(ERROR_CONST[order + 1] * D[order + 2]) / err_target
+
+        error_norms = np.array([error_m_norm, error_norm, error_p_norm])
+        with np.errstate(divide = "ignore"):
+            factors = error_norms ** (-1 / np.arange(order, order + 3))
+
+        order += np.argmax(factors) - 1
+        factor = min(MAX_FACTOR, safety * np.max(factors))
+        dt *= factor
+        _change_D(D, order, factor)
+        n_equal_steps = 0
+        lu_perm = None
+    #----------------------------------
+
+
+def integrate_bdf(f, u_0, t_final, err_target, jac = None, dt_0 = None, dense_output = False,
+                  stats = False, step_hook = None):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with the variable order (1 to 5),
+    variable step backward differentiation formulas until time t_final
+    without plotting anything
+    Suited to stiff problems, e.g. the Van der Pol oscillator with large mu
+
+    Each step solves the implicit BDF equation by Newton iteration. The
+    Jacobian and the LU factorization of I - c J are kept across steps and
+    only recomputed when the step size or order changes (factorization) or
+    Newton fails to converge (Jacobian).
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    jac: function of t and u returning the Jacobian df/du as a d x d matrix,
+         if None it is approximated by finite differences (d calls to f)
+    dt_0: first trial time step, chosen from f(0, u_0) if None
+    dense_output: if True, also return an ivp.DenseOutput that evaluates the
+                  solution at any times in [0, t_final]
+    stats: if True, also return an ivp.SolverStats for the run, with RHS calls
+           made for finite difference Jacobians included in n_evals
+    step_hook: function hook(t, u, dt) called after every accepted step, e.g. for a profiler
+
+    Returns
+    t_list: array of time points used, shape (n,)
+    u_list: array of solution at each time, shape (n,) or (n, d)
+    sol: ivp.DenseOutput, only returned when dense_output is True
+    solver_stats: ivp.SolverStats, only returned when stats is True
+    """
+    solver_stats = None
+    if stats:
+        solver_stats = ivp.SolverStats()
+        f = solver_stats.counted(f)
+
+    t_list = ivp.GrowableArray()
+    u_list = ivp.GrowableArray(np.shape(u_0))
+    du_list = ivp.GrowableArray(np.shape(u_0)) #du/dt at each point, for the dense output
+
+    for t, u, du in _bdf_steps(f, u_0, t_final, err_target, jac, dt_0, solver_stats):
+        if stats:
+            solver_stats.lap("time_step")
+        t_list.append(t)
+        u_list.append(u)
+        if dense_output:
+            du_list.append(du)
+        if stats:
+            solver_stats.lap("time_storage")
+
+        if step_hook is not None and t_list.n > 1:
+            step_hook(t, u, t - t_list.data[t_list.n - 2])
+            if stats: #the hook's own time is not counted
+                solver_stats.start()
+
+    t_list = t_list.trim()
+    u_list = u_list.trim()
+
+    results = (t_list, u_list)
+    if dense_output:
+        results += (ivp.DenseOutput(t_list, u_list, du_list.trim()),)
+    if stats:
+        solver_stats.lap("time_storage")
+        solver_stats.record_steps(t_list)
+        results += (solver_stats,)
+    return results
+
+
+def stream_bdf(f, u_0, t_final, err_target, jac = None, dt_0 = None,
+               chunk_size = 1024, t_eval = None, stride = 1, keep_last = False):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with the variable order BDF method until
+    time t_final, yielding the solution in chunks as it integrates instead of
+    storing it all
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    jac: function of t and u returning the Jacobian df/du, see integrate_bdf
+    dt_0: first trial time step, see integrate_bdf
+    chunk_size: number of output points per chunk
+    t_eval: increasing times in [0, t_final] at which to output the solution
+            (cubic Hermite interpolation between steps), or None
+    stride: when t_eval is None, output every stride-th step (and the last)
+    keep_last: if True, output only the solution at t_final
+
+    Yields
+    t_chunk: array of output times
+    u_chunk: array of ordered tuples representing solution at those times
+    """
+    sampler = ivp.StreamSampler(np.shape(u_0), chunk_size, t_eval, stride, keep_last)
+
+    for t, u, du in _bdf_steps(f, u_0, t_final, err_target, jac, dt_0):
+        yield from sampler.push(t, u, du, final = t >= t_final)
+
+    yield from sampler.flush()
+
+
+def stiff_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars, jac = None, stats = False):
+    """
+    Solves du/dt = f(t,u), u(0) = u_0 with the implicit BDF method until time t_final
+    Allows for first order systems
+
+    Parameters
+    f: function of t and u where f = du/dt
+    u_0: initial value
+    t_final: final time
+    err_target: target step error
+    plot_vars: variables to plot against time
+    phase_vars: variables to plot in phase diagram (list of ordered pairs)
+    jac: function of t and u returning the Jacobian df/du, see integrate_bdf
+    stats: if True, also return an ivp.SolverStats including the plotting time
+
+    Results
+    Plots the time series of chosen variables
+    Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty, see integrate_bdf
+
+    Returns
+    t_list: array of time points used
+    u_list: array of ordered tuples representing solution at each time
+    solver_stats: ivp.SolverStats, only returned when stats is True
+    """
+    results = integrate_bdf(f, u_0, t_final, err_target, jac, stats = stats)
+    ivp._timed_plot(results[-1] if stats else None, ivp.plot_solution, results[0], results[1],
+                    plot_vars, phase_vars)
+
+    return results
@@ -0,0 +1,111 @@
+"""
+Computational Math Module 5: Right-hand sides and Jacobians compiled from sympy expressions
+"""
+
+import numpy as np
+import sympy as sp
+from sympy.printing.numpy import NumPyPrinter
+
+
+def _generate(name, exprs, shape, t, u_syms):
+    """
+    Generates and compiles the source of a function name(t, u, out = None)
+    that evaluates exprs after common subexpression elimination
+    A 0-d u (the state of a one-equation system) gives a 0-d result
+
+    Parameters
+    name: function name
+    exprs: flat list of sympy expressions
+    shape: shape of the result (before any batch dimensions of u)
+    t: time symbol
+    u_syms: state symbols, u_syms[k] is read from u[k]
+
+    Returns
+    func: compiled function, with its source code in func.source
+    """
+    #Rename the user's symbols so every name in the source is a valid identifier
+    t_arg = sp.Symbol("t")
+    u_args = [sp.Symbol("u_" + str(k)) for k in range(len(u_syms))]
+    renaming = dict(zip([t] + list(u_syms), [t_arg] + u_args))
+    exprs = [sp.sympify(expr).xreplace(renaming) for expr in exprs]
+
+    replacements, reduced = sp.cse(exprs, symbols = sp.numbered_symbols("x_"))
+    printer = NumPyPrinter()
+
+    lines = ["def " + name + "(t, u, out = None):"]
+    if len(u_args) == 1:
+        lines.append("    if numpy.ndim(u) == 0: #scalar state, evaluated as a state of length 1")
+        lines.append("        value = " + name + "(t, numpy.reshape(u, (1,))).reshape(())")
+        lines.append("        if out is None:")
+        lines.append("            return value")
+        lines.append("        out[...] = value")
+        lines.append("        return out")
+    for k, u_arg in enumerate(u_args):
+        lines.append("    " + str(u_arg) + " = u[" + str(k) + "]")
+    for sym, expr in replacements:
+        lines.append("    " + str(sym) + " = " + printer.doprint(expr))
+    lines.append("    if out is None:")
+    lines.append("        out = numpy.empty(" + str(tuple(shape)) + " + numpy.shape(u_0))")
+    for index, expr in zip(np.ndindex(*shape), reduced):
+        lines.append("    out[" + ", ".join(str(i) for i in index) + "] = " + printer.doprint(expr))
+    lines.append("    return out")
+
+    source = "\n".join(lines) + "\n"
+    namespace = {"numpy": np}
+    exec(compile(source, "<" + name + ">", "exec"), namespace)
+    func = namespace[name]
+    func.source = source
+    func.writes_out = True #the solvers pass their own buffers as out, see ivp._evaluate
+
+    return func
+
+
+def compile_rhs(exprs, t, u_syms, params = None):
+    """
+    Builds du/dt = f(t,u) and its exact Jacobian from sympy expressions,
+    with common subexpressions computed once
+
+    Both returned functions take (t, u, out = None). If out is given the
+    result is written into it and nothing else is allocated for a single
+    state; otherwise a new array is returned. The Runge-Kutta and Adams
+    workspaces of Initial_Value_Problems pass their stage buffers as out, so
+    the fixed step and adaptive solvers call f without allocating; the other
+    solvers (e.g. Stiff_Solvers, Extrapolation_Solvers) use the returned array.
+    u may also be a batch of states of shape (d, m), as used by
+    ivp.ensemble_ivp, and the result then has shape (d, m) (or (d, d, m) for
+    the Jacobian). For a single equation u may be a scalar, and so is the result.
+
+    Parameters
+    exprs: list of d sympy expressions for du/dt in terms of t and u_syms
+    t: time symbol
+    u_syms: list of d state symbols
+    params: dict of parameter symbols and the values to substitute, or None
+
+    Returns
+    f: function of t and u where f = du/dt, usable by every solver
+    jac: function of t and u returning the d x d Jacobian df/du,
+         usable as jac in Stiff_Solvers.integrate_bdf
+
+    Example
+    x, y, t = sp.symbols("x y t")
+    mu = sp.Symbol("mu")
+    f, jac = compile_rhs([y, mu * (1 - x**2) * y - x], t, [x, y], {mu: 20})
+    """
+    exprs = [sp.sympify(expr) for expr in exprs]
+    if params:
+        exprs = [expr.subs(params) for expr in exprs]
+
+    d = len(u_syms)
+    if len(exprs) != d:
+        raise Exception("Need one expression per state symbol")
+
+    unknown = set().union(*[expr.free_symbols for expr in exprs]) - set(u_syms) - {t}
+    if unknown:
+        raise Exception("Give values in params for " + ", ".join(sorted(str(sym) for sym in unknown)))
+
+    jac_exprs = list(sp.Matrix(exprs).jacobian(list(u_syms)))
+
+    f = _generate("f", exprs, (d,), t, u_syms)
+    jac = _generate("jac", jac_exprs, (d, d), t, u_syms)
+
+    return f, jac
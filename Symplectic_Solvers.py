@@ -0,0 +1,182 @@
+"""
+Computational Math Module 5: Symplectic solvers for separable Hamiltonian systems
+"""
+
+import numpy as np
+import Initial_Value_Problems as ivp
+
+#Composition weights: each step is a sequence of Stormer-Verlet substeps of size w * dt
+#The weights of the higher order methods are from Yoshida (1990), symmetric so the
+#methods stay time-reversible
+#----------------------------------
+_Y4_W1 = 1 / (2 - 2 ** (1/3))
+_Y6_W = [0.784513610477560, 0.235573213359357, -1.17767998417887]
+
+COMPOSITIONS = {
+    "verlet": [1.],
+
+    "yoshida4": [_Y4_W1, 1 - 2 * _Y4_W1, _Y4_W1],
+
+    "yoshida6": _Y6_W + [1 - 2 * sum(_Y6_W)] + _Y6_W[::-1],
+}
+#----------------------------------
+
+
+def _verlet_substeps(velocity, force, q, p, a, dt, weights):
+    """
+    Advances q and p in place by one step of the composition with the given weights
+    Each Stormer-Verlet substep of size h is a half kick, a drift and a half kick:
+        p += h/2 force(q),  q += h velocity(p),  p += h/2 force(q)
+    The force at the end of a substep is the force at the start of the next,
+    so a holds it between calls and each substep needs one new force evaluation
+
+    Parameters
+    velocity: function of p giving dq/dt
+    force: function of q giving dp/dt
+    q, p: position and momentum arrays, updated in place
+    a: force(q) at the start of the step, updated in place
+    dt: time step
+    weights: composition weights
+    """
+    for w in weights:
+        h = w * dt
+        p += h / 2 * a
+        q += h * velocity(p)
+        a[...] = force(q)
+        p += h / 2 * a
+
+
+def integrate_symplectic(velocity, force, q_0, p_0, dt, t_final, method = "verlet", stats = False):
+    """
+    Solves the separable Hamiltonian system dq/dt = velocity(p), dp/dt = force(q)
+    with q(0) = q_0, p(0) = p_0 and step size dt until time t_final
+    without plotting anything
+
+    For H(q, p) = T(p) + V(q), velocity is dT/dp and force is -dV/dq; for the
+    pendulum, velocity = lambda p: p and force = lambda q: -10 * np.sin(q).
+    Symplectic methods keep the energy error bounded over long times instead of
+    letting it drift, so much larger steps can be used than with the Runge-Kutta
+    methods of ivp.integrate_ivp when only the long-time behaviour matters.
+
+    Parameters
+    velocity: function of p giving dq/dt
+    force: function of q giving dp/dt
+    q_0: initial position (float or np.ndarray)
+    p_0: initial momentum, same shape as q_0
+    dt: time step
+    t_final: final time
+    method: "verlet" (Stormer-Verlet / leapfrog, order 2, 1 force call per step),
+            "yoshida4" (order 4, 3 force calls) or "yoshida6" (order 6, 7 force calls)
+    stats: if True, also return an ivp.SolverStats for the run
+           (n_evals counts calls of velocity and force together)
+
+    Returns
+    t_list: array of time points
+    u_list: array of shape (n + 1, 2 d) holding q then p at each time, the same
+            layout as a first order system u = (q, p) so it can be plotted with
+            ivp.plot_solution (u[0] is q and u[1] is p for a single degree of freedom)
+    solver_stats: ivp.SolverStats, only returned when stats is True
+    """
+    if method not in COMPOSITIONS:
+        raise Exception("Enter one of " + ", ".join(COMPOSITIONS))
+    weights = COMPOSITIONS[method]
+
+    #Setup variables
+    #----------------------------------
+    solver_stats = None
+    if stats:
+        solver_stats = ivp.SolverStats()
+        velocity_uncounted = velocity
+        force_uncounted = force
+
+        def velocity(p):
+            solver_stats.n_evals += 1
+            return velocity_uncounted(p)
+
+        def force(q):
+            solver_stats.n_evals += 1
+            return force_uncounted(q)
+
+    q = np.atleast_1d( ivp._initial_state(q_0) ).copy()
+    p = np.atleast_1d( ivp._initial_state(p_0) ).copy()
+    if q.shape != p.shape:
+        raise Exception("q_0 and p_0 must have the same shape")
+    d = len(q)
+
+    n = int(t_final / dt) #number of steps to take, total points is n + 1
+    t_list = np.linspace(0, t_final, n + 1)
+    u_list = np.empty( (n + 1, 2 * d) )
+    u_list[0, :d] = q
+    u_list[0, d:] = p
+
+    a = np.array(force(q), dtype = float).reshape(q.shape)
+    if stats:
+        solver_stats.lap("time_storage")
+    #----------------------------------
+
+    #Integrate the system
+    #----------------------------------
+    for i in range(n):
+        _verlet_substeps(velocity, force, q, p, a, dt, weights)
+        u_list[i + 1, :d] = q
+        u_list[i + 1, d:] = p
+    #----------------------------------
+
+    if stats:
+        solver_stats.lap("time_step")
+        solver_stats.record_steps(t_list)
+        return t_list, u_list, solver_stats
+    return t_list, u_list
+
+
+def energy(hamiltonian, u_list):
+    """
+    Evaluates the Hamiltonian along a solution from integrate_symplectic (or any
+    solution whose state is q then p), e.g. to check for energy drift
+
+    Parameters
+    hamiltonian: function H(q, p)
+    u_list: array of shape (n, 2 d)
+
+    Returns
+    H_list: array of H at each time
+    """
+    u_list = np.asarray(u_list)
+    d = u_list.shape[1] // 2
+    q = u_list[:, :d].T
+    p = u_list[:, d:].T
+    if d == 1:
+        q = q[0]
+        p = p[0]
+    return np.asarray(hamiltonian(q, p))
+
+
+def symplectic_ivp(velocity, force, q_0, p_0, dt, t_final, method, plot_vars, phase_vars):
+    """
+    Solves dq/dt = velocity(p), dp/dt = force(q) with a symplectic method until
+    time t_final and plots the solution
+
+    Parameters
+    velocity: function of p giving dq/dt
+    force: function of q giving dp/dt
+    q_0: initial position
+    p_0: initial momentum
+    dt: time step
+    t_final: final time
+    method: "verlet", "yoshida4" or "yoshida6", see integrate_symplectic
+    plot_vars: variables to plot against time (q is 0 to d - 1, p is d to 2 d - 1)
+    phase_vars: variables to plot in phase diagram (list of ordered pairs)
+
+    Results
+    Plots the time series of chosen variables
+    Plots the 2D phase space of chosen variable pairs
+    No figure is made when both lists are empty
+
+    Returns
+    t_list: array of time points
+    u_list: array of q then p at each time
+    """
+    t_list, u_list = integrate_symplectic(velocity, force, q_0, p_0, dt, t_final, method)
+    ivp.plot_solution(t_list, u_list, plot_vars, phase_vars)
+
+    return t_list, u_list
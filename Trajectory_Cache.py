@@ -0,0 +1,355 @@
+"""
+Computational Math Module 5: Content-addressed cache of Initial Value Problem solutions
+"""
+
+import os
+import sys
+import types
+import pickle
+import hashlib
+import inspect
+import functools
+import sysconfig
+from collections import OrderedDict
+import numpy as np
+
+#Solutions are kept next to the modules, like __pycache__
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__ivp_cache__")
+DEFAULT_MAX_BYTES = 2 * 1024**3 #on-disk tier
+DEFAULT_MAX_MEMORY_BYTES = 512 * 1024**2 #in-memory tier
+
+_source_hashes = {} #hash of the source files each solver module uses, by module name
+#Modules under these folders (standard library, installed packages) are not part of the solver code
+_LIBRARY_PATHS = tuple(sorted( {os.path.abspath(sysconfig.get_paths()[name])
+                                for name in ("stdlib", "platstdlib", "purelib", "platlib")} ))
+
+
+def _fingerprint(obj, h, seen):
+    """
+    Feeds a description of obj into the hash h that depends only on its content
+
+    Functions are described by their bytecode, constants, default arguments,
+    attributes (e.g. terminal and direction of event functions) and the
+    values of the variables they capture or read from their module, so two
+    lambdas written identically in different places (with the same
+    parameter values) give the same fingerprint, and changing a parameter
+    such as mu gives a different one. Numbers are described by their value
+    whatever their type (30 and 30.0 give the same fingerprint, as do integer
+    and float arrays with equal entries) and numpy types by their name.
+
+    Parameters
+    obj: object to describe
+    h: hashlib object, updated in place
+    seen: ids of functions already described (for recursive functions)
+    """
+    if isinstance(obj, float) or (isinstance(obj, int) and not isinstance(obj, bool) and abs(obj) <= 2**53):
+        h.update(repr( ("number", float(obj)) ).encode()) #integers that are exact floats hash as floats
+    elif obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        h.update(repr( (type(obj).__name__, obj) ).encode())
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.kind in "iu" and np.array_equal(obj.astype(float), obj):
+            obj = obj.astype(float) #the solvers convert the initial values to float anyway
+        h.update(repr( ("ndarray", obj.dtype.str, obj.shape) ).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, np.generic):
+        _fingerprint(obj.item(), h, seen)
+    elif isinstance(obj, np.dtype) or (isinstance(obj, type) and issubclass(obj, np.generic)):
+        h.update(repr( ("dtype", np.dtype(obj).name) ).encode())
+    elif isinstance(obj, (tuple, list)):
+        h.update(repr( (type(obj).__name__, len(obj)) ).encode())
+        for item in obj:
+            _fingerprint(item, h, seen)
+    elif isinstance(obj, dict):
+        h.update(repr( ("dict", len(obj)) ).encode())
+        for key in sorted(obj, key = repr):
+            _fingerprint(key, h, seen)
+            _fingerprint(obj[key], h, seen)
+    elif isinstance(obj, types.ModuleType):
+        h.update(repr( ("module", obj.__name__) ).encode())
+    elif isinstance(obj, types.CodeType):
+        h.update(obj.co_code)
+        _fingerprint(obj.co_names, h, seen)
+        _fingerprint(obj.co_consts, h, seen)
+    elif isinstance(obj, types.FunctionType):
+        h.update(b"function")
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        _fingerprint(obj.__code__, h, seen)
+        _fingerprint(obj.__defaults__, h, seen)
+        _fingerprint(obj.__kwdefaults__, h, seen)
+        _fingerprint(dict(obj.__dict__), h, seen) #attributes such as the terminal and direction of events
+        cells = obj.__closure__ or ()
+        _fingerprint([cell.cell_contents for cell in cells], h, seen)
+        used = {name: obj.__globals__[name] for name in _global_names(obj.__code__) if name in obj.__globals__}
+        _fingerprint(used, h, seen)
+    elif isinstance(obj, functools.partial):
+        h.update(b"partial")
+        _fingerprint( (obj.func, obj.args, obj.keywords), h, seen )
+    else:
+        #Builtins, compiled functions and plain objects: fall back to their pickle
+        try:
+            h.update(pickle.dumps(obj))
+        except Exception:
+            raise Exception("Cannot fingerprint " + repr(obj) + " for the trajectory cache")
+
+
+def _global_names(code):
+    """
+    Names a code object (or any function nested in it) may read from its module
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _is_local(module):
+    """
+    True if module has a source file outside the standard library and installed packages
+    """
+    path = getattr(module, "__file__", None)
+    return isinstance(path, str) and not os.path.abspath(path).startswith(_LIBRARY_PATHS)
+
+
+def _local_modules(module, found):
+    """
+    Collects module and, recursively, the local modules it uses, either
+    imported as modules or through names imported from them
+
+    Parameters
+    module: module object
+    found: dict of the modules collected so far by name, updated in place
+    """
+    if module.__name__ in found or not _is_local(module):
+        return
+    found[module.__name__] = module
+    for value in list(vars(module).values()):
+        if isinstance(value, types.ModuleType):
+            _local_modules(value, found)
+        else:
+            used = sys.modules.get(getattr(value, "__module__", None) or "")
+            if used is not None:
+                _local_modules(used, found)
+
+
+def _source_hash(solver):
+    """
+    Hash of the source files of the module defining solver and of every
+    local module it uses (e.g. Initial_Value_Problems for Stiff_Solvers),
+    so that cached solutions are not reused after the solver code changes
+    """
+    name = solver.__module__
+    if name not in _source_hashes:
+        found = {}
+        if name in sys.modules:
+            _local_modules(sys.modules[name], found)
+        h = hashlib.sha256()
+        for module_name in sorted(found):
+            try:
+                with open(found[module_name].__file__, "rb") as source:
+                    h.update( (module_name + ":").encode() + hashlib.sha256(source.read()).digest() )
+            except OSError: #no source file to read
+                pass
+        _source_hashes[name] = h.hexdigest() if found else ""
+    return _source_hashes[name]
+
+
+def _bound_arguments(solver, f, args, kwargs):
+    """
+    Arguments of solver(f, *args, **kwargs) by parameter name, defaults
+    included, so positional and keyword calls of the same problem match
+    Solvers without a signature keep the arguments as given
+    """
+    try:
+        bound = inspect.signature(solver).bind(f, *args, **kwargs)
+    except (TypeError, ValueError): #no signature, or arguments the solver would reject anyway
+        return [f, list(args), kwargs]
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def trajectory_key(solver, f, *args, **kwargs):
+    """
+    Computes the content address of solver(f, *args, **kwargs)
+
+    Parameters
+    solver: solver function, e.g. ivp.integrate_ivp
+    f: function of t and u where f = du/dt
+    args, kwargs: remaining solver arguments (initial value, step settings, method, ...)
+
+    Returns
+    key: hex string naming the solution
+    """
+    h = hashlib.sha256()
+    h.update( (solver.__module__ + "." + solver.__qualname__ + ":" + _source_hash(solver)).encode() )
+    _fingerprint(_bound_arguments(solver, f, args, kwargs), h, set())
+    return h.hexdigest()
+
+
+def _freeze(result):
+    """
+    Marks the arrays of a result read-only, since cached results are shared between callers
+    """
+    for item in (result if isinstance(result, tuple) else (result,)):
+        if isinstance(item, np.ndarray):
+            item.flags.writeable = False
+    return result
+
+
+class TrajectoryCache:
+    """
+    Two-tier cache of solver results keyed by trajectory_key
+
+    The memory tier holds results of the current process. The disk tier
+    keeps pickled results in directory, so reruns of a script or renders of
+    other scenes can skip the solve. Each tier evicts its least recently used
+    entries once it holds more than its size limit.
+
+    Parameters
+    directory: folder for the disk tier, or None to keep results in memory only
+    max_bytes: size limit of the disk tier
+    max_memory_bytes: size limit of the memory tier
+    """
+    def __init__(self, directory = DEFAULT_DIRECTORY, max_bytes = DEFAULT_MAX_BYTES,
+                 max_memory_bytes = DEFAULT_MAX_MEMORY_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_memory_bytes = max_memory_bytes
+
+        self.memory = OrderedDict() #key -> (result, size), least recently used first
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def _remember(self, key, result, size):
+        """
+        Adds a result to the memory tier, evicting old entries past max_memory_bytes
+        """
+        if key in self.memory:
+            self.memory_bytes -= self.memory.pop(key)[1]
+        if size > self.max_memory_bytes:
+            return
+        self.memory[key] = (result, size)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            self.memory_bytes -= self.memory.popitem(last = False)[1][1]
+
+    def _evict_disk(self):
+        """
+        Removes the least recently used files until the disk tier fits in max_bytes
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append( (stat.st_mtime, stat.st_size, name) )
+
+        total = sum(entry[1] for entry in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError: #already removed by another process
+                pass
+            total -= size
+
+    def get(self, key):
+        """
+        Looks up a result, returning None if it is in neither tier
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key][0]
+
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        os.utime(path) #the modification time orders the disk tier for eviction
+
+        result = _freeze(pickle.loads(data))
+        self._remember(key, result, len(data))
+        return result
+
+    def put(self, key, result):
+        """
+        Stores a result in both tiers
+        """
+        data = pickle.dumps(result, protocol = pickle.HIGHEST_PROTOCOL)
+        self._remember(key, result, len(data))
+
+        if self.directory is None or len(data) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok = True)
+        #Write to a temporary name first so a reader never sees a partial file
+        temp_path = self._path(key) + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, self._path(key))
+        self._evict_disk()
+
+    def cached(self, solver, f, *args, **kwargs):
+        """
+        Returns solver(f, *args, **kwargs), solving only if the same problem
+        has not been solved before
+
+        Parameters
+        solver: solver function, e.g. ivp.integrate_ivp or ivp.integrate_adaptive
+        f: function of t and u where f = du/dt
+        args, kwargs: remaining solver arguments
+
+        Returns
+        result: whatever solver returns, with read-only arrays
+        """
+        key = trajectory_key(solver, f, *args, **kwargs)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = _freeze(solver(f, *args, **kwargs))
+        self.put(key, result)
+        return result
+
+    def clear(self):
+        """
+        Empties both tiers
+        """
+        self.memory.clear()
+        self.memory_bytes = 0
+        if self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+default_cache = TrajectoryCache()
+
+
+def cached(solver, f, *args, **kwargs):
+    """
+    Solves with solver(f, *args, **kwargs) through default_cache
+
+    Parameters
+    solver: solver function, e.g. ivp.integrate_ivp or ivp.integrate_adaptive
+    f: function of t and u where f = du/dt
+    args, kwargs: remaining solver arguments
+
+    Returns
+    result: whatever solver returns, with read-only arrays
+
+    Example
+    t_list, u_list = cached(ivp.integrate_ivp, f, u_0, dt, t_final, method)
+    """
+    return default_cache.cached(solver, f, *args, **kwargs)
@@ -3,9 +3,9 @@ Solves, then animates solution to the Van der Pol oscillator
 """
 
 import Initial_Value_Problems as ivp
+import Trajectory_Cache as tc
 import manim as mn
 import numpy as np
-import math
 
 class VanDerPolAnim(mn.Scene):
     def construct(self):
@@ -21,9 +21,9 @@ class VanDerPolAnim(mn.Scene):
         err_target = 1e-4
         
         #Run the algorithm, but don't plot
-        t_list, u_list = ivp.adaptive_ivp(f, u_0, t_final, err_target, [], [])
-        u0_list = [u[0] for u in u_list] #position over time
-        u1_list = [u[1] for u in u_list] #velocity over time
+        t_list, u_list, sol = tc.cached(ivp.integrate_adaptive, f, u_0, t_final, err_target, dense_output = True)
+        u0_list = u_list[:, 0] #position over time
+        u1_list = u_list[:, 1] #velocity over time
         
         #Setup animation
         #------------------------------
@@ -67,58 +67,18 @@ class VanDerPolAnim(mn.Scene):
         labels += u0u1_axes.get_y_axis_label(mn.Tex(r"$u_1$", font_size = 24), edge = mn.UP)
         
         #Add functions
-        def largest_leq_than(t):
-            """
-            Finds the largest time value in t_list less than or equal to input t,
-            which allows us to determine which interval t is in
-            """
-            n = len(t_list)
-            
-            lower_index = 0 
-            #lower bound starts at t_list[0] which is t = 0
-            upper_index = n - 1 
-            #upper bound starts at t_list[n - 1] which is t = t_final
-            
-            #Catch t not within time range, should not happen in normal use
-            if t < t_list[0] or t > t_list[n - 1]:
-                raise Exception("t not within time range")
-            
-            #Binary search for the interval that t is in
-            while upper_index - lower_index > 1:
-                mid_index = math.floor( (lower_index + upper_index) / 2 )
-                if t == t_list[mid_index]:
-                    lower_index = mid_index
-                    upper_index = mid_index + 1
-                elif t < t_list[mid_index]:
-                    upper_index = mid_index
-                elif t > t_list[mid_index]:
-                    lower_index = mid_index
-                    
-            return lower_index 
-            #t is between t_list[lower_index] (inclusive) and t_list[lower_index + 1] exclusive
-            #except for input t = t_final
-            
-        
         def u0(t):
             """
-            Solution to u_0 (position) interpolated from a list of points
+            Solution to u_0 (position) evaluated from the dense output interpolant
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (u0_list[i + 1] - u0_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + u0_list[i]
-            #linear interpolating function, in point-slope form
+            return sol(t)[0]
             
             
         def u1(t):
             """
-            Solution to u_1 (velocity) interpolated from a list of points
+            Solution to u_1 (velocity) evaluated from the dense output interpolant
             """
-            i = largest_leq_than(t)
-            #t is between t_list[i] and t_list[i + 1]
-            
-            return (u1_list[i + 1] - u1_list[i]) / (t_list[i + 1] - t_list[i]) * (t - t_list[i]) + u1_list[i]
-            #linear interpolating function, in point-slope form
+            return sol(t)[1]
             
         
         def u0_u1(t):
@@ -4,6 +4,7 @@ Van der Pol oscillator simulation
 
 import numpy as np
 import Initial_Value_Problems as ivp
+import Stiff_Solvers as stiff
 
 def main():
     #Describe ODE and initial condition
@@ -24,13 +25,18 @@ def main():
     
     #With adaptive time step
     err_target = 1e-4
-    t_list, u_list = ivp.adaptive_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars)
-    dt_list = [t_list[i + 1] - t_list[i] for i in range(0, len(t_list) - 1)]
+    t_list, u_list, stats = ivp.adaptive_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars, stats = True)
+    print(stats) #step counts, step sizes and timings
     
     #With different initial values, using adaptive time step
     u_0_list = [np.array([1., 0.]), np.array([1.5, 0.]), np.array([2., 0.])]
-    t_list, u_list = ivp.compare_adaptive(f, u_0_list, t_final, err_target, plot_vars, phase_vars)
-    dt_list = [t_list[i + 1] - t_list[i] for i in range(0, len(t_list) - 1)]
+    t_lists, u_lists, stats = ivp.compare_adaptive(f, u_0_list, t_final, err_target, plot_vars, phase_vars, stats = True)
+    print(stats)
+    
+    #With the implicit stiff solver, which takes large steps through the slow phases
+    jac = lambda t,u: np.array([[0, 1], [-2 * mu * u[0] * u[1] - 1, mu * (1 - u[0] ** 2)]])
+    t_list, u_list, stats = stiff.stiff_ivp(f, u_0, t_final, err_target, plot_vars, phase_vars, jac, stats = True)
+    print(stats)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file